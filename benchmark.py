@@ -0,0 +1,266 @@
+import argparse
+import compileall
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy
+import scipy
+
+from gmt_random_test.gmt_randomness_test import GmtRandomnessTest
+from gmt_random_test.test import Test
+
+# Sizes of the sequences the test units are timed on by default, and number of calls of each test unit at every size
+UNIT_SIZES: dict = {20000: 20, 1000000: 5}
+# Number of calls at the sizes timed only on demand (--units): a single call of linear complexity lasts minutes there
+UNIT_CALLS: dict = {**UNIT_SIZES, 100000000: 1}
+# Size from which a test unit is not warmed up and its peak memory is traced during the timed calls, so that it runs once per call
+TRACED_UNIT_BITS: int = 10000000
+# Sizes of the samples the batteries are timed on, and number of samples
+BATTERY_SIZES: dict = {20000: 1000, 1000000: 20}
+PERCENTILES: list = [50, 90, 99]
+# Module whose import is timed, and the budget of its import above the import of numpy, in seconds
+IMPORT_MODULE: str = "gmt_random_test.gmt_randomness_test"
+IMPORT_BUDGET_S: float = 0.04
+
+
+def environment() -> dict:
+    """
+    Describe the machine and the libraries, so that the results of different runs can be told apart.
+    :return: the description of the environment
+    """
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "scipy": scipy.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def summarize_latencies(latencies_ns: list, bits: int) -> dict:
+    """
+    Summarize the durations of the calls of a benchmark.
+    :param latencies_ns: the duration of every call, in nanoseconds
+    :param bits: the number of bits processed by every call
+    :return: the percentiles and mean of the latencies in seconds and the throughput at the median latency
+    """
+    latencies: numpy.ndarray = numpy.array(latencies_ns, dtype=numpy.float64) / 1e9
+    summary: dict = {"calls": len(latencies_ns), "mean_s": float(numpy.mean(latencies))}
+    for percentile in PERCENTILES:
+        summary[f'p{percentile}_s'] = float(numpy.percentile(latencies, percentile))
+    summary["bits_per_second"] = bits / summary["p50_s"] if summary["p50_s"] > 0 else None
+    return summary
+
+
+def format_throughput(bits_per_second: float) -> str:
+    """
+    Format a throughput for the reports.
+    :param bits_per_second: the throughput, None if the calls were too fast to be timed
+    :return: the throughput in Mbit/s
+    """
+    return "- Mbit/s" if bits_per_second is None else f'{bits_per_second / 1e6:.1f} Mbit/s'
+
+
+def peak_memory(function) -> int:
+    """
+    Measure the peak of the memory allocated by Python and numpy during a call.
+    :param function: the function without arguments to call
+    :return: the peak in bytes, above the memory allocated before the call
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def import_time(module: str) -> float:
+    """
+    Time the import of a module in a fresh interpreter, as a command line tool or a worker process pays it.
+    :param module: the name of the module
+    :return: the import time in seconds
+    """
+    code: str = f'import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)'
+    return float(subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout)
+
+
+def benchmark_import(calls: int, budget: float) -> dict:
+    """
+    Time the import of the package, above the import of numpy it cannot avoid, and check it against a budget.
+    :param calls: the number of interpreters started for each module
+    :param budget: the budget of the import above the import of numpy, in seconds
+    :return: the import times and whether or not the import is within the budget
+    """
+    # Stale bytecode would be compiled again by every interpreter (it is not saved with PYTHONDONTWRITEBYTECODE)
+    compileall.compile_dir(os.path.join(os.path.dirname(os.path.abspath(__file__)), IMPORT_MODULE.partition(".")[0]), quiet=1)
+    # The interpreters importing numpy alone and the package alternate, so that the load of the machine affects both alike
+    durations: numpy.ndarray = numpy.array([[import_time("numpy"), import_time(IMPORT_MODULE)] for i in range(calls)])
+    numpy_s, package_s = (float(duration) for duration in numpy.median(durations, axis=0))
+    result: dict = {"module": IMPORT_MODULE, "numpy_s": numpy_s, "import_s": package_s, "overhead_s": package_s - numpy_s, "budget_s": budget}
+    result["within_budget"] = result["overhead_s"] <= budget
+    print(f'import {IMPORT_MODULE} \t{package_s * 1000:.1f} ms \t({result["overhead_s"] * 1000:.1f} ms above numpy, budget {budget * 1000:.0f} ms{"" if result["within_budget"] else ", OVER BUDGET"})')
+    return result
+
+
+def benchmark_unit(name: str, test_unit: Test, bits: numpy.ndarray, calls: int) -> dict:
+    """
+    Time a test unit on a single sequence, as Test.run does it.
+    :param name: the name of the test unit in its battery
+    :param test_unit: the test unit
+    :param bits: the sequence of bits
+    :param calls: the number of timed calls
+    :return: the latencies, throughput and peak memory of the test unit
+    """
+    traced: bool = bits.size >= TRACED_UNIT_BITS
+    if traced:
+        # The calls last long enough for the caches not to matter, and tracemalloc adds little to their few large allocations
+        tracemalloc.start()
+    else:
+        # A first call outside of the measures warms up the caches (imports, FFT plans, lookup tables)
+        test_unit.run(bits)
+    latencies_ns: list = []
+    try:
+        for i in range(calls):
+            start: int = time.perf_counter_ns()
+            test_unit.run(bits)
+            latencies_ns.append(time.perf_counter_ns() - start)
+        memory: int = tracemalloc.get_traced_memory()[1] if traced else peak_memory(lambda: test_unit.run(bits))
+    finally:
+        if traced:
+            tracemalloc.stop()
+    result: dict = {"name": name, "test": str(test_unit), "class": type(test_unit).__name__, "bits": bits.size}
+    result.update(summarize_latencies(latencies_ns, bits.size))
+    result["peak_memory_bytes"] = memory
+    return result
+
+
+def benchmark_units(sizes: dict, seed: int, names: list = None) -> list:
+    """
+    Time every test unit of the battery of each size.
+    :param sizes: the number of calls for each size of sequence
+    :param seed: the seed of the random sequences
+    :param names: the names of the test units to time (default: all of them)
+    :return: the results of every test unit and size
+    """
+    results: list = []
+    for size, calls in sizes.items():
+        try:
+            battery: dict = GmtRandomnessTest(size).battery
+        except RuntimeError as error:
+            print(f'{size} bits: skipped ({error})')
+            continue
+        bits: numpy.ndarray = numpy.random.default_rng(seed).integers(0, 2, size, dtype=numpy.uint8)
+        for name, test_unit in battery.items():
+            if names is not None and name not in names:
+                continue
+            result: dict = benchmark_unit(name, test_unit, bits, calls)
+            print(f'{size} bits \t{test_unit} \t{result["p50_s"] * 1000:.3f} ms \t{format_throughput(result["bits_per_second"])} \t{result["peak_memory_bytes"] / 2 ** 20:.1f} MiB')
+            results.append(result)
+    return results
+
+
+def benchmark_battery(size: int, samples_size: int, seed: int, calls: int = 1, workers: int = 1) -> dict:
+    """
+    Time the whole battery of a size over a file of random samples, report printing included.
+    :param size: the number of bits of every sample
+    :param samples_size: the number of samples
+    :param seed: the seed of the random samples
+    :param calls: the number of timed runs of the battery
+    :param workers: the number of processes checking the samples
+    :return: the latencies, throughput and peak memory of the battery
+    """
+    gmt_test: GmtRandomnessTest = GmtRandomnessTest(size)
+    samples: numpy.ndarray = numpy.random.default_rng(seed).integers(0, 256, samples_size * (size // 8), dtype=numpy.uint8)
+    with tempfile.TemporaryDirectory() as directory:
+        file_name: str = os.path.join(directory, f'data_{size}')
+        samples.tofile(file_name)
+        run_battery = lambda: gmt_test.run_all_battery_with_file(file_name, workers=workers)
+        latencies_ns: list = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(calls):
+                start: int = time.perf_counter_ns()
+                run_battery()
+                latencies_ns.append(time.perf_counter_ns() - start)
+            memory: int = peak_memory(run_battery)
+    result: dict = {"bits": size, "samples": samples_size, "tests": len(gmt_test.battery), "workers": workers}
+    result.update(summarize_latencies(latencies_ns, size * samples_size))
+    result["peak_memory_bytes"] = memory
+    print(f'GMT_{size} battery, {samples_size} samples \t{result["p50_s"]:.3f} s \t{format_throughput(result["bits_per_second"])} \t{memory / 2 ** 20:.1f} MiB')
+    return result
+
+
+def compare(previous: dict, current: dict):
+    """
+    Print the speedup of every benchmark present in both runs.
+    :param previous: the results of the previous run, as saved in JSON
+    :param current: the results of the current run
+    """
+    if previous.get("import") and current.get("import"):
+        print(f'import {current["import"]["module"]} \tx{previous["import"]["import_s"] / current["import"]["import_s"]:.2f}')
+    previous_units: dict = {(unit["bits"], unit["name"]): unit for unit in previous.get("units", [])}
+    for unit in current["units"]:
+        old: dict = previous_units.get((unit["bits"], unit["name"]))
+        if old is not None:
+            print(f'{unit["bits"]} bits \t{unit["test"]} \tx{old["p50_s"] / unit["p50_s"]:.2f} \t(memory x{unit["peak_memory_bytes"] / max(old["peak_memory_bytes"], 1):.2f})')
+    previous_batteries: dict = {(battery["bits"], battery["samples"], battery["workers"]): battery for battery in previous.get("batteries", [])}
+    for battery in current["batteries"]:
+        old: dict = previous_batteries.get((battery["bits"], battery["samples"], battery["workers"]))
+        if old is not None:
+            print(f'GMT_{battery["bits"]} battery, {battery["samples"]} samples \tx{old["p50_s"] / battery["p50_s"]:.2f}')
+
+
+def parse_sizes(text: str, default: dict) -> dict:
+    """
+    Parse a list of sizes such as "20000:20,1000000" (size, optionally followed by the count for that size).
+    :param text: the sizes, comma separated
+    :param default: the default count of every known size
+    :return: the count for every size
+    """
+    sizes: dict = {}
+    for item in text.split(","):
+        size, _, count = item.partition(":")
+        sizes[int(size)] = int(count) if count else default.get(int(size), 1)
+    return sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the test units and the batteries of the GM/T randomness tests.")
+    parser.add_argument("--units", default=",".join(str(size) for size in UNIT_SIZES), help="sizes of the sequences the test units are timed on, as size[:calls],... (empty to skip, 100000000 on demand only)")
+    parser.add_argument("--batteries", default=",".join(str(size) for size in BATTERY_SIZES), help="sizes of the batteries to time over random samples, as size[:samples],... (empty to skip)")
+    parser.add_argument("--names", default=None, help="names of the test units to time, comma separated (default: all)")
+    parser.add_argument("--battery-calls", type=int, default=1, help="number of timed runs of every battery")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes checking the samples of the batteries")
+    parser.add_argument("--import-calls", type=int, default=10, help="number of interpreters started to time the import (0 to skip)")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_S, help="budget of the import of the package above the import of numpy, in seconds (the exit status is 1 if it is exceeded)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random sequences")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file the results are saved to")
+    parser.add_argument("--compare", default=None, help="JSON file of a previous run to compare the results with")
+    arguments = parser.parse_args()
+
+    results: dict = {"environment": environment(), "import": None, "units": [], "batteries": []}
+    if arguments.import_calls > 0:
+        results["import"] = benchmark_import(arguments.import_calls, arguments.import_budget)
+    if arguments.units:
+        results["units"] = benchmark_units(parse_sizes(arguments.units, UNIT_CALLS), arguments.seed, None if arguments.names is None else arguments.names.split(","))
+    if arguments.batteries:
+        for size, samples_size in parse_sizes(arguments.batteries, BATTERY_SIZES).items():
+            results["batteries"].append(benchmark_battery(size, samples_size, arguments.seed, arguments.battery_calls, arguments.workers))
+    with open(arguments.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f'Results saved to {arguments.output}')
+    if arguments.compare is not None:
+        with open(arguments.compare) as f:
+            compare(json.load(f), results)
+    if results["import"] is not None and not results["import"]["within_budget"]:
+        sys.exit(1)
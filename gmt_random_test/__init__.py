@@ -1,6 +1,3 @@
-from cgi import test
-
-
-from .test import Test, Result
+from .test import Test, Result, ResultTable
 from .functions import *
 from .test_unit import *
@@ -0,0 +1,220 @@
+#
+# Copyright (C) Guojun Tang 2022
+#
+# Inspired by the work of David Johnston (C) 2017: https://github.com/dj-on-github/sp800_22_tests
+#   and Luca Pasqualini (C) 2019: https://github.com/InsaneMonster/NistRng
+#
+# This work is licensed under a BSD 3-Clause.
+#
+# You should have received a copy of the license along with this
+# work. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
+
+# Import packages
+
+import numpy
+
+# Import required src
+
+from gmt_random_test.functions import count_overlapping_patterns, marginalize_pattern_counts
+from gmt_random_test.packed import count_derivative_ones, count_lagged_xor_ones, popcount
+
+
+class SequenceContext:
+    """
+    The sequences of bits under test together with the representations derived from them, shared by all the tests
+    run on the same sequences. Every representation is computed the first time a test asks for it and then kept, so
+    running a whole battery computes each one at most once per sequence.
+    A context can be given to Test.run_batch in place of a matrix of bits; a single sequence is a matrix of one row.
+    A context of a single sequence can also be built from its statistics alone (see from_statistics).
+    Attributes:
+        - bits: the sequences of bits, one per row, wrapped in a 2D numpy array (ndarray)
+        - size: the number of bits in every sequence
+    """
+
+    def __init__(self, bits: numpy.ndarray, packed_bytes: numpy.ndarray = None, size: int = None):
+        """
+        :param bits: the sequences of bits, one per row, wrapped in a 2D numpy array (ndarray), or a single sequence,
+                     or None for a single sequence whose bits are not available
+        :param packed_bytes: the same sequences packed by rows as numpy.packbits does, if they are already available
+        :param size: the number of bits of the sequence, when its bits are not given
+        """
+        self._bits: numpy.ndarray = None if bits is None else bits if bits.ndim == 2 else bits.reshape((1, bits.size))
+        self.size: int = size if self._bits is None else self._bits.shape[1]
+        self._packed_bytes: numpy.ndarray = packed_bytes
+        self._pattern_length: int = 0
+        self._lags: set = set()
+        self._orders: set = set()
+        self._cache: dict = {}
+
+    @classmethod
+    def from_statistics(cls, size: int, ones: int = None, lags_ones: dict = None, orders_ones: dict = None, pattern_counts: numpy.ndarray = None):
+        """
+        Build the context of a single sequence known only through its statistics, as a sliding window is. The tests
+        reading only the given statistics can run on it; reading the bits or another representation raises.
+        :param size: the number of bits of the sequence
+        :param ones: the number of ones of the sequence (see ones)
+        :param lags_ones: the autocorrelation count of every lag (see autocorrelation_ones)
+        :param orders_ones: the ones of the derivative of every order (see derivative_ones)
+        :param pattern_counts: the counts of the overlapping patterns of a length m, wrapping around the end (see
+                               pattern_counts); the counts of the shorter patterns are derived from them
+        :return: the context
+        """
+        context: SequenceContext = cls(None, size=size)
+        if ones is not None:
+            context._cache[("ones",)] = numpy.array([ones], dtype=numpy.int64)
+        for lag, count in (lags_ones or {}).items():
+            context._cache[("autocorrelation", lag)] = numpy.array([count], dtype=numpy.int64)
+        for order, count in (orders_ones or {}).items():
+            context._cache[("derivative", order)] = numpy.array([count], dtype=numpy.int64)
+        if pattern_counts is not None:
+            context._pattern_length = int(pattern_counts.size).bit_length() - 1
+            context._cache[("patterns", context._pattern_length)] = numpy.asarray(pattern_counts, dtype=numpy.int64).reshape((1, pattern_counts.size))
+        return context
+
+    @property
+    def bits(self) -> numpy.ndarray:
+        if self._bits is None:
+            raise RuntimeError("the bits of the sequence are not available.")
+        return self._bits
+
+    def __len__(self) -> int:
+        return 1 if self._bits is None else self._bits.shape[0]
+
+    def _cached(self, key: tuple, compute):
+        """
+        Return the representation stored under the given key, computing and storing it the first time.
+        :param key: the key of the representation
+        :param compute: the function without arguments computing the representation
+        :return: the representation
+        """
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def packed_bytes(self) -> numpy.ndarray:
+        """
+        The sequences packed eight bits per byte (the bits after the end of a sequence are zero).
+        :return: the packed bytes of every row, wrapped in a 2D numpy array (ndarray)
+        """
+        if self._packed_bytes is None:
+            self._packed_bytes = numpy.packbits(self.bits, axis=1)
+        return self._packed_bytes
+
+    def words(self) -> numpy.ndarray:
+        """
+        The sequences packed in uint64 words (the first bit is the most significant bit of the first word, the bits
+        after the end of a sequence are zero).
+        :return: the words of every row, wrapped in a 2D numpy array (ndarray)
+        """
+        def compute_words() -> numpy.ndarray:
+            packed_bytes: numpy.ndarray = self.packed_bytes()
+            padded_bytes: numpy.ndarray = numpy.zeros((len(self), (packed_bytes.shape[1] + 7) // 8 * 8), dtype=numpy.uint8)
+            padded_bytes[:, :packed_bytes.shape[1]] = packed_bytes
+            return padded_bytes.view(">u8").astype(numpy.uint64)
+        return self._cached(("words",), compute_words)
+
+    def popcounts(self) -> numpy.ndarray:
+        """
+        The number of ones in every byte of the packed sequences.
+        :return: the popcounts of every row, wrapped in a 2D numpy array (ndarray)
+        """
+        return self._cached(("popcounts",), lambda: popcount(self.packed_bytes()))
+
+    def ones(self) -> numpy.ndarray:
+        """
+        The number of ones in every sequence.
+        :return: the number of ones of every row, in a numpy array (ndarray)
+        """
+        return self._cached(("ones",), lambda: numpy.sum(self.popcounts(), axis=1, dtype=numpy.int64))
+
+    def signs(self, dtype: type = numpy.float64) -> numpy.ndarray:
+        """
+        The sequences with the zeros converted to -1 (the adjusted digits of the random walk and of the DFT).
+        :param dtype: the numpy type of the digits
+        :return: the digits of every row, wrapped in a 2D numpy array (ndarray) of the given type
+        """
+        return self._cached(("signs", numpy.dtype(dtype)), lambda: self.bits.astype(dtype) * 2 - 1)
+
+    def request_autocorrelation_lag(self, lag: int):
+        """
+        Declare that the autocorrelation count of the given lag will be read, so that all the declared lags are
+        computed together in a single pass.
+        :param lag: the lag d (the shift of the sequence)
+        """
+        self._lags.add(lag)
+
+    def requested_lags(self) -> list:
+        """
+        :return: the autocorrelation lags declared so far (see request_autocorrelation_lag), in increasing order
+        """
+        return sorted(self._lags)
+
+    def autocorrelation_ones(self, lag: int) -> numpy.ndarray:
+        """
+        The number of ones in the XOR of every sequence with itself shifted by the given lag, over the first n - d bits
+        (see packed.count_lagged_xor_ones). The first time, the counts of all the declared lags are computed.
+        :param lag: the lag d (the shift of the sequence)
+        :return: the count of every row, in a numpy array (ndarray)
+        """
+        if ("autocorrelation", lag) not in self._cache:
+            lags: list = sorted(self._lags.union([lag]).difference(key[1] for key in self._cache if key[0] == "autocorrelation"))
+            counts: numpy.ndarray = count_lagged_xor_ones(self.words(), self.size, lags)
+            for index, computed_lag in enumerate(lags):
+                self._cache[("autocorrelation", computed_lag)] = counts[:, index]
+        return self._cache[("autocorrelation", lag)]
+
+    def request_derivative_order(self, order: int):
+        """
+        Declare that the ones of the binary derivative of the given order will be counted, so that all the declared
+        orders are counted along a single chain of derivatives.
+        :param order: the order k of the derivative
+        """
+        self._orders.add(order)
+
+    def requested_orders(self) -> list:
+        """
+        :return: the derivative orders declared so far (see request_derivative_order), in increasing order
+        """
+        return sorted(self._orders)
+
+    def derivative_ones(self, order: int) -> numpy.ndarray:
+        """
+        The number of ones in the binary derivative of the given order of every sequence, n - k bits long
+        (see packed.count_derivative_ones). The first time, the counts of all the declared orders are computed.
+        :param order: the order k of the derivative
+        :return: the count of every row, in a numpy array (ndarray)
+        """
+        if ("derivative", order) not in self._cache:
+            orders: list = sorted(self._orders.union([order]).difference(key[1] for key in self._cache if key[0] == "derivative"))
+            counts: numpy.ndarray = count_derivative_ones(self.words(), self.size, orders)
+            for index, computed_order in enumerate(orders):
+                self._cache[("derivative", computed_order)] = counts[:, index]
+        return self._cache[("derivative", order)]
+
+    def request_pattern_length(self, pattern_length: int):
+        """
+        Declare that the counts of the overlapping patterns of the given length will be read. The patterns are then
+        counted once at the longest declared length and the counts of all the shorter patterns derived from those.
+        :param pattern_length: the length m of the patterns
+        """
+        self._pattern_length = max(self._pattern_length, pattern_length)
+
+    def requested_pattern_length(self) -> int:
+        """
+        :return: the longest pattern length declared so far (see request_pattern_length), 0 if there is none
+        """
+        return self._pattern_length
+
+    def pattern_counts(self, pattern_length: int) -> numpy.ndarray:
+        """
+        The counts of the overlapping patterns of the given length, wrapping around the end of every sequence
+        (see functions.count_overlapping_patterns). They are marginalized from the counts of the longest declared
+        length (see request_pattern_length) if it is longer.
+        :param pattern_length: the length m of the patterns
+        :return: the counts of the 2^m patterns of every row, wrapped in a 2D numpy array (ndarray)
+        """
+        longest_length: int = max(self._pattern_length, pattern_length)
+        counts: numpy.ndarray = self._cached(("patterns", longest_length), lambda: numpy.array([count_overlapping_patterns(bits, longest_length) for bits in self.bits], dtype=numpy.int64).reshape((len(self), 2 ** longest_length)))
+        if pattern_length == longest_length:
+            return counts
+        return self._cached(("patterns", pattern_length), lambda: marginalize_pattern_counts(counts, pattern_length))
@@ -19,4 +19,128 @@ def pack_sequence(sequence: numpy.ndarray) -> numpy.ndarray:
     return numpy.unpackbits(numpy.array(sequence, dtype=numpy.uint8)).astype(numpy.int8)
 
 def pack_01str(sequence: numpy.ndarray) -> numpy.ndarray:
-    return numpy.fromstring(sequence ,'u1') - ord('0')
\ No newline at end of file
+    return numpy.fromstring(sequence ,'u1') - ord('0')
+
+def count_overlapping_patterns(bits: numpy.ndarray, pattern_length: int, chunk_size: int = 1 << 20, wrap: bool = True) -> numpy.ndarray:
+    """
+    Count the occurrences of every overlapping m-bit pattern in the sequence, wrapping around its end as the
+    Serial and Approximate Entropy tests require (the sequence is padded with its first m - 1 bits).
+    The m-bit code of every position is built once as a rolling integer and the codes are histogrammed with bincount.
+    :param bits: the sequence of bits, wrapped in a numpy array (ndarray)
+    :param pattern_length: the length m of the patterns, from 0 up to 16
+    :param chunk_size: the number of positions encoded at a time, to bound the temporary memory
+    :param wrap: whether or not the patterns wrap around the end (if not, only the n - m + 1 patterns inside the sequence are counted)
+    :return: the counts of the 2^m patterns (indexed by the pattern read as a big-endian integer) in a numpy array (ndarray)
+    """
+    if pattern_length < 0 or pattern_length > 16:
+        raise RuntimeError("inapplicable pattern length.")
+    if pattern_length == 0:
+        return numpy.array([bits.size], dtype=numpy.int64)
+    padded_bits: numpy.ndarray = numpy.concatenate((bits, bits[0:pattern_length - 1])) if wrap else bits
+    positions_number: int = bits.size if wrap else max(bits.size - pattern_length + 1, 0)
+    counts: numpy.ndarray = numpy.zeros(2 ** pattern_length, dtype=numpy.int64)
+    for start in range(0, positions_number, chunk_size):
+        end: int = min(start + chunk_size, positions_number)
+        codes: numpy.ndarray = numpy.zeros(end - start, dtype=numpy.uint32)
+        for k in range(pattern_length):
+            codes <<= 1
+            codes |= padded_bits[start + k:end + k].astype(numpy.uint32)
+        counts += numpy.bincount(codes, minlength=2 ** pattern_length)
+    return counts
+
+def marginalize_pattern_counts(counts: numpy.ndarray, pattern_length: int) -> numpy.ndarray:
+    """
+    Derive the counts of the overlapping patterns of a length from the counts of longer patterns: every m-bit pattern
+    at a position is the prefix of the longer pattern at the same position (wrapping around the end of the sequence
+    in both cases), so its count is the sum of the counts of the longer patterns starting with it.
+    :param counts: the counts of the 2^M patterns (see count_overlapping_patterns), on the last axis of a numpy array (ndarray)
+    :param pattern_length: the length m of the patterns, from 0 up to M
+    :return: the counts of the 2^m patterns, on the last axis of a numpy array (ndarray)
+    """
+    if pattern_length < 0 or 2 ** pattern_length > counts.shape[-1]:
+        raise RuntimeError("inapplicable pattern length.")
+    return counts.reshape(counts.shape[:-1] + (2 ** pattern_length, -1)).sum(axis=-1)
+
+def run_length_encode(bits: numpy.ndarray, block_size: int = None) -> tuple:
+    """
+    Split the sequence in runs (maximal groups of adjacent equal bits) using the positions where the bits change.
+    If a block size is given, a run never crosses the boundary between two consecutive blocks, so the runs of every
+    block (or of every row of a flattened batch of sequences) are kept apart.
+    :param bits: the sequence of bits, wrapped in a numpy array (ndarray)
+    :param block_size: the size of the blocks whose boundaries always start a new run (default: no blocks)
+    :return: the start index, the length and the bit value of every run, each in a numpy array (ndarray)
+    """
+    if bits.size == 0:
+        empty: numpy.ndarray = numpy.zeros(0, dtype=numpy.int64)
+        return empty, empty.copy(), numpy.zeros(0, dtype=bits.dtype)
+    breaks: numpy.ndarray = bits[1:] != bits[:-1]
+    if block_size is not None:
+        breaks[block_size - 1::block_size] = True
+    starts: numpy.ndarray = numpy.flatnonzero(breaks) + 1
+    starts = numpy.concatenate((numpy.zeros(1, dtype=starts.dtype), starts)).astype(numpy.int64)
+    lengths: numpy.ndarray = numpy.diff(starts, append=bits.size)
+    return starts, lengths, bits[starts]
+
+
+def longest_runs_in_blocks(bits: numpy.ndarray, block_size: int, blocks_number: int, runs: tuple = None) -> tuple:
+    """
+    Find the longest run of ones and the longest run of zeroes in each of the first blocks_number consecutive blocks
+    of block_size bits.
+    :param bits: the sequence of bits, wrapped in a numpy array (ndarray)
+    :param block_size: the number of bits in a block
+    :param blocks_number: the number of blocks
+    :param runs: the runs of the blocks if already known, as returned by run_length_encode(bits[:blocks_number * block_size], block_size)
+    :return: the length of the longest run of ones and of the longest run of zeroes of every block (0 if the block
+             has no such run), each in a numpy array (ndarray)
+    """
+    if blocks_number == 0:
+        return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+    starts, lengths, values = run_length_encode(bits[:blocks_number * block_size], block_size) if runs is None else runs
+    # Every block starts with a run, so the runs of a block are the slice between the first runs of two blocks
+    first_runs: numpy.ndarray = numpy.searchsorted(starts, numpy.arange(blocks_number, dtype=numpy.int64) * block_size)
+    longest_ones: numpy.ndarray = numpy.maximum.reduceat(numpy.where(values == 1, lengths, 0), first_runs)
+    longest_zeroes: numpy.ndarray = numpy.maximum.reduceat(numpy.where(values == 0, lengths, 0), first_runs)
+    return longest_ones, longest_zeroes
+
+
+def count_runs_by_length(bits_matrix: numpy.ndarray, max_length: int, chunk_size: int = 1 << 22) -> numpy.ndarray:
+    """
+    Count the runs of zeroes and ones of every length in every row (runs longer than max_length are counted as
+    max_length). The rows are run length encoded a range of columns at a time, carrying the last run of every range
+    over to the next one, so the temporary memory does not grow with the length of the rows.
+    :param bits_matrix: the sequences of bits, one per row, wrapped in a 2D numpy array (ndarray)
+    :param max_length: the length the longer runs are counted as
+    :param chunk_size: the number of bits (over all the rows) encoded at a time
+    :return: the counts in a 3D numpy array (ndarray) indexed by row, bit value of the run and run length
+    """
+    rows_number, row_size = bits_matrix.shape
+    counts: numpy.ndarray = numpy.zeros(rows_number * 2 * (max_length + 1), dtype=numpy.int64)
+    rows: numpy.ndarray = numpy.arange(rows_number, dtype=numpy.int64)
+    # The run still open at the end of the previous range of every row (a length of 0 if there is none)
+    open_values: numpy.ndarray = numpy.zeros(rows_number, dtype=numpy.int64)
+    open_lengths: numpy.ndarray = numpy.zeros(rows_number, dtype=numpy.int64)
+
+    def add_runs(runs_rows: numpy.ndarray, runs_values: numpy.ndarray, runs_lengths: numpy.ndarray):
+        indexes: numpy.ndarray = (runs_rows * 2 + runs_values) * (max_length + 1) + numpy.minimum(runs_lengths, max_length)
+        counts[:] += numpy.bincount(indexes, minlength=counts.size)
+
+    columns_number: int = max(1, chunk_size // max(rows_number, 1))
+    for start in range(0, row_size, columns_number):
+        end: int = min(start + columns_number, row_size)
+        starts, lengths, values = run_length_encode(bits_matrix[:, start:end].ravel(), end - start)
+        values = values.astype(numpy.int64)
+        # Every row of the range starts a run: it continues the open run if the bits are the same, else closes it
+        first_runs: numpy.ndarray = numpy.searchsorted(starts, rows * (end - start))
+        continued: numpy.ndarray = (open_lengths > 0) & (values[first_runs] == open_values)
+        lengths[first_runs[continued]] += open_lengths[continued]
+        closed: numpy.ndarray = (open_lengths > 0) & ~continued
+        add_runs(rows[closed], open_values[closed], open_lengths[closed])
+        # The last run of every row stays open, the others are complete
+        last_runs: numpy.ndarray = numpy.append(first_runs[1:], starts.size) - 1
+        complete: numpy.ndarray = numpy.ones(starts.size, dtype=bool)
+        complete[last_runs] = False
+        add_runs(starts[complete] // (end - start), values[complete], lengths[complete])
+        open_values, open_lengths = values[last_runs], lengths[last_runs]
+    opened: numpy.ndarray = open_lengths > 0
+    add_runs(rows[opened], open_values[opened], open_lengths[opened])
+    return counts.reshape((rows_number, 2, max_length + 1))
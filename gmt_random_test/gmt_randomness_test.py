@@ -12,26 +12,115 @@
 import numpy
 import math
 import os
-from gmt_random_test.qvalues import QValueCollector
+import functools
+
+from gmt_random_test.test import Result, ResultTable, Test
+from gmt_random_test.context import SequenceContext
+from gmt_random_test.profiling import Profiler
+from gmt_random_test.config import Battery, GMT_BATTERIES
+
+# Number of bits unpacked at a time by the battery (bounds the memory of the batched kernels)
+_BATCH_BITS: int = 1 << 22
+
+
+def minimum_passes(samples_size: int, significance_value: float) -> int:
+    """
+    The smallest number of samples which must pass a test for the generator to pass it, as in GM/T 0005-2021:
+    s * (1 - a - 3 * sqrt(a * (1 - a) / s)) for s samples and the significance value a (981 for 1000 samples at 0.01).
+    :param samples_size: the number of samples s
+    :param significance_value: the significance value a of the test
+    :return: the minimum pass count
+    """
+    if samples_size == 0:
+        return 0
+    return math.ceil(samples_size * (1.0 - significance_value - 3.0 * math.sqrt(significance_value * (1.0 - significance_value) / samples_size)))
+
+
+class ScreeningReport:
+    """
+    Outcome of a screening run of the battery (see GmtRandomnessTest.screen_all_battery_with_file).
+    Attributes:
+        - samples_size: the number of samples to screen.
+        - table: the results of the samples and tests which were run; the samples a test did not reach are NaN and not passed.
+        - tested: the number of samples each test was run on, in a numpy array (ndarray).
+        - failures: the number of failed samples of each test, in a numpy array (ndarray).
+        - allowed_failures: the number of failed samples each test can have and still pass, in a numpy array (ndarray).
+        - tripped_test: the name of the test which stopped the run, or None if every test ran on every sample.
+        - skipped_runs: the number of (sample, test) runs skipped.
+        - skipped_work: the estimated share of the running time skipped, weighting every test by its estimated cost.
+    """
+
+    def __init__(self,
+                 samples_size: int, table: ResultTable, tested: numpy.ndarray, failures: numpy.ndarray, allowed_failures: numpy.ndarray,
+                 tripped_test: str, skipped_runs: int, skipped_work: float):
+        self.samples_size: int = samples_size
+        self.table: ResultTable = table
+        self.tested: numpy.ndarray = tested
+        self.failures: numpy.ndarray = failures
+        self.allowed_failures: numpy.ndarray = allowed_failures
+        self.tripped_test: str = tripped_test
+        self.skipped_runs: int = skipped_runs
+        self.skipped_work: float = skipped_work
+
+    def __repr__(self) -> str:
+        return f'tripped test: {self.tripped_test}; skipped runs: {self.skipped_runs}; skipped work: {self.skipped_work}'
+
+    @property
+    def passed(self) -> bool:
+        return self.tripped_test is None
+
 
-from gmt_random_test.test import Result, Test
-from .config import *
 class GmtRandomnessTest():
 
     def __init__(self, bits_length: int, intervals_num: int=10):
         self._bits_length = bits_length
         self._intervals_num = intervals_num
-        if bits_length == 20000:
-            self._battery = GMT_20000
-        elif bits_length == 1000000:
-            self._battery = GMT_1000000
-        # elif bits_length == 100000000:
-        #     self._battery == GMT_100000000
-        else:
+        self._profiler: Profiler = None
+        if bits_length not in GMT_BATTERIES:
             raise RuntimeError("inapplicable bits length.")
+        self._battery: Battery = GMT_BATTERIES[bits_length]
+
+    @property
+    def battery(self) -> Battery:
+        """
+        The test units of the battery for the bits length, by name (each one is built the first time it is read).
+        """
+        return self._battery
+
+    @property
+    def profiler(self) -> Profiler:
+        """
+        The Profiler recording the invocations of the tests, None unless profiling is enabled.
+        """
+        return self._profiler
+
+    def enable_profiling(self, trace_memory: bool = False, profiled_tests=()) -> Profiler:
+        """
+        Record the duration of every invocation of the tests in the following runs, and optionally their peak
+        allocation and a cProfile profile of some tests (in the process running them, so with a single worker).
+        The per-test aggregates are then given by profile_aggregates.
+        :param trace_memory: record the peak allocation of every invocation (tracemalloc slows the tests down)
+        :param profiled_tests: the names of the tests to run under cProfile (as printed in the report, e.g. "Poker (m=8)")
+        :return: the new Profiler
+        """
+        self._profiler = Profiler(trace_memory, profiled_tests)
+        return self._profiler
+
+    def disable_profiling(self):
+        self._profiler = None
+
+    def profile_aggregates(self) -> dict:
+        """
+        The count, total, mean and p50/p95/p99 durations of the invocations of every test recorded since profiling
+        was enabled (see Profiler.aggregates).
+        :return: the aggregates by test name
+        """
+        if self._profiler is None:
+            raise RuntimeError("profiling not enabled.")
+        return self._profiler.aggregates()
 
     def _run_single_test(self, bits: numpy.ndarray, test_unit: Test):
-        return test_unit.run(bits)
+        return test_unit.run(bits, self._profiler)
 
     def run_by_name_with_bits(self, bits: numpy.ndarray, name: str):
         result: Result = None
@@ -55,56 +144,281 @@ class GmtRandomnessTest():
             result, time = self._run_single_test(bits, test_unit)
             print(result)
     
-    def _read_sequences_from_file(self, file_name: str, sample_size: int):
+    def _read_sequences_from_file(self, file_name: str) -> numpy.ndarray:
+        """
+        Map the samples of the file in memory without copying them. The result is a read-only (samples, bytes) view
+        of the file and each sample is only read from the disk when the battery accesses it.
+        A trailing partial sample is reported and left out.
+        :param file_name: the binary file containing the samples
+        :return: the samples of packed bytes, wrapped in a 2D numpy array (memmap)
+        """
         buffer_size: int = self._bits_length // 8
-        f = open(file_name, "rb")
-        sequences = []
-        for i in range(sample_size):
-            sequences.append(numpy.frombuffer(f.read(buffer_size), dtype=numpy.uint8))
-        f.close()
-        return sequences
-
-    def run_battery_by_names_with_file(self, file_name: str, test_names):
         file_size: int = os.path.getsize(file_name)
-        samples_size: int = file_size // (self._bits_length // 8)
-        sequences = self._read_sequences_from_file(file_name, samples_size)
-        battery: dict = {k: v for k, v in self._battery.items() if k in test_names}
-        self._run_battery(sequences, battery)
+        samples_size, remainder = divmod(file_size, buffer_size)
+        if remainder != 0:
+            print(f'Ignored a trailing partial sample of {remainder} bytes in {file_name} (sample size: {buffer_size} bytes).')
+        if samples_size == 0:
+            return numpy.zeros((0, buffer_size), dtype=numpy.uint8)
+        return numpy.memmap(file_name, dtype=numpy.uint8, mode="r", shape=(samples_size, buffer_size))
 
-    def _run_battery(self, sequences, battery: dict):
-        result: Result = None
-        time: int = 0
-        samples_size: int = len(sequences)
+    def run_battery_by_names_with_file(self, file_name: str, test_names, workers: int = 1) -> ResultTable:
+        """
+        Run the named tests of the battery on every sample of the file and print the report.
+        :param file_name: the binary file containing the samples
+        :param test_names: the names of the tests to run
+        :param workers: the number of processes checking the samples (None to use every CPU)
+        :return: the results of every sample and test
+        """
+        sequences: numpy.ndarray = self._read_sequences_from_file(file_name)
+        battery: dict = self._battery.subset(test_names)
+        return self._run_battery(sequences, battery, workers)
+
+    def _run_battery(self, sequences, battery: dict, workers: int = 1) -> ResultTable:
+        table: ResultTable = self._run_tests(sequences, list(battery.values()), workers)
+        self._print_report(table)
+        return table
+
+    def _print_report(self, table: ResultTable):
         # TODO print format
-        print(f'GMT randomness test (samples size: {samples_size})')
+        print(f'GMT randomness test (samples size: {len(table)})')
         print("Types of test: \t\t\tPasses: \tDistribution:")
-        for test_unit in battery.values():
-            # todo two q value lists
-            q_value_list = []
-            q_value_list1 = []
-            passes: int = 0
-            for seq in sequences:
-                bits: numpy.ndarray = numpy.unpackbits(seq)
-                result, time = self._run_single_test(bits, test_unit)
-                passes += 1 if result.passed else 0
-                if result.q_value.size == 2:
-                    q_value_list.append(result.q_value[0])
-                    q_value_list1.append(result.q_value[1])
-                else:
-                    q_value_list.append(result.q_value[0])
-
-            if q_value_list1 != []:
-                q_value_score1: float = QValueCollector.compute_value(numpy.array(q_value_list1), self._intervals_num)
-                q_value_score: float = QValueCollector.compute_value(numpy.array(q_value_list), self._intervals_num)
-                print(f'{test_unit} \t\t\t{passes} \t{q_value_score}, {q_value_score1}')
-            else:
-                q_value_score: float = QValueCollector.compute_value(numpy.array(q_value_list), self._intervals_num)
-                print(f'{test_unit} \t\t\t{passes} \t{q_value_score}')
+        for test_name, test_passes, q_value_scores in zip(table.test_names, table.passes(), table.q_value_scores()):
+            print(f'{test_name} \t\t\t{test_passes} \t{", ".join(str(q_value_score) for q_value_score in q_value_scores)}')
 
+    def _run_tests(self, sequences, test_units: list, workers: int = 1) -> ResultTable:
+        """
+        Run the test units on all the sequences, spreading the sequences across a pool of processes if requested.
+        The results are stored in the order of the sequences whatever the number of workers.
+        :param sequences: the sequences of packed bytes
+        :param test_units: the list of test units to run
+        :param workers: the number of processes checking the sequences (None to use every CPU)
+        :return: the results of every sequence and test unit
+        """
+        table: ResultTable = ResultTable([str(test_unit) for test_unit in test_units], len(sequences), self._intervals_num)
+        if workers is None:
+            workers = os.cpu_count()
+        if workers <= 1 or len(sequences) <= 1:
+            for i, test_results in enumerate(_run_tests_on_sequences(test_units, self._bits_length, sequences, self._profiler)):
+                table.fill(i, 0, test_results)
+            return table
+        # Imported here: a process checking its samples alone does not pay for it
+        import concurrent.futures
+        # Send a few contiguous chunks of sequences to each worker to balance the load
+        chunk_size: int = max(1, math.ceil(len(sequences) / (workers * 4)))
+        if isinstance(sequences, numpy.memmap) and sequences.filename is not None:
+            # The workers map their own chunk of the file rather than receiving a copy of the bytes
+            run_chunk = functools.partial(_run_tests_on_file_chunk, test_units, self._bits_length, sequences.filename)
+            chunks: list = [(sequences.offset + i * sequences.shape[1], min(chunk_size, len(sequences) - i)) for i in range(0, len(sequences), chunk_size)]
+        else:
+            run_chunk = functools.partial(_run_tests_on_sequences, test_units, self._bits_length)
+            chunks: list = [sequences[i:i + chunk_size] for i in range(0, len(sequences), chunk_size)]
+        if self._profiler is not None:
+            # Every worker records the chunk in its own profiler, merged here
+            run_chunk = functools.partial(_run_profiled_chunk, run_chunk, self._profiler.trace_memory)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for start, chunk_results in zip(range(0, len(sequences), chunk_size), executor.map(run_chunk, chunks)):
+                if self._profiler is not None:
+                    chunk_results, chunk_profiler = chunk_results
+                    self._profiler.merge(chunk_profiler)
+                for i, test_results in enumerate(chunk_results):
+                    table.fill(i, start, test_results)
+        return table
 
-    
-    def run_all_battery_with_file(self, file_name: str):
-        file_size: int = os.path.getsize(file_name)
-        samples_size: int = file_size // (self._bits_length // 8)
-        sequences = self._read_sequences_from_file(file_name, samples_size)
-        self._run_battery(sequences, self._battery)
+    def run_all_battery_with_file(self, file_name: str, workers: int = 1) -> ResultTable:
+        """
+        Run the whole battery on every sample of the file and print the report.
+        :param file_name: the binary file containing the samples
+        :param workers: the number of processes checking the samples (None to use every CPU)
+        :return: the results of every sample and test
+        """
+        sequences: numpy.ndarray = self._read_sequences_from_file(file_name)
+        return self._run_battery(sequences, self._battery, workers)
+
+    def screen_all_battery_with_file(self, file_name: str) -> ScreeningReport:
+        """
+        Screen the generator with the whole battery on the samples of the file, stopping as soon as it is known to
+        fail. The tests run one after another, cheapest first by their estimated cost (see Test.estimated_cost), each
+        on batches of samples doubling in size, and the run stops at the sample on which a test has failed on more
+        samples than the GM/T pass count allows for the number of samples (see minimum_passes).
+        A broken generator is then rejected by the cheap tests, without running the expensive ones.
+        The screening runs in a single process, as the order of the tests matters.
+        :param file_name: the binary file containing the samples
+        :return: the partial results, the test which stopped the run and the work skipped
+        """
+        sequences: numpy.ndarray = self._read_sequences_from_file(file_name)
+        return self._screen_battery(sequences, self._battery)
+
+    def screen_battery_by_names_with_file(self, file_name: str, test_names) -> ScreeningReport:
+        """
+        Screen the generator with the named tests of the battery on the samples of the file.
+        See screen_all_battery_with_file.
+        :param file_name: the binary file containing the samples
+        :param test_names: the names of the tests to run
+        :return: the partial results, the test which stopped the run and the work skipped
+        """
+        sequences: numpy.ndarray = self._read_sequences_from_file(file_name)
+        battery: dict = self._battery.subset(test_names)
+        return self._screen_battery(sequences, battery)
+
+    def _screen_battery(self, sequences, battery: dict) -> ScreeningReport:
+        test_units: list = list(battery.values())
+        samples_size: int = len(sequences)
+        table: ResultTable = ResultTable([str(test_unit) for test_unit in test_units], samples_size, self._intervals_num)
+        tested: numpy.ndarray = numpy.zeros(len(test_units), dtype=numpy.int64)
+        failures: numpy.ndarray = numpy.zeros(len(test_units), dtype=numpy.int64)
+        allowed_failures: numpy.ndarray = numpy.array([samples_size - minimum_passes(samples_size, test_unit.significance_value) for test_unit in test_units], dtype=numpy.int64)
+        costs: numpy.ndarray = numpy.array([test_unit.estimated_cost() for test_unit in test_units], dtype=float)
+        max_batch_size: int = max(1, _BATCH_BITS // self._bits_length)
+        tripped: int = None
+        for i in sorted(range(len(test_units)), key=lambda i: costs[i]):
+            # No test can trip before it has failed on one sample more than allowed, the batches then double
+            batch_size: int = min(max_batch_size, int(allowed_failures[i]) + 1)
+            start: int = 0
+            while start < samples_size and tripped is None:
+                end: int = min(start + batch_size, samples_size)
+                packed_bytes: numpy.ndarray = numpy.asarray(sequences[start:end], dtype=numpy.uint8)
+                bits_matrix: numpy.ndarray = numpy.unpackbits(packed_bytes, axis=1, count=self._bits_length)
+                context: SequenceContext = SequenceContext(bits_matrix, packed_bytes if self._bits_length % 8 == 0 else None)
+                test_units[i].prepare_batch(context)
+                test_results: tuple = test_units[i].run_batch(context, self._profiler)
+                # Stop at the sample on which the test fails once more than allowed
+                total_failures: numpy.ndarray = failures[i] + numpy.cumsum(~test_results[2])
+                over: numpy.ndarray = numpy.flatnonzero(total_failures > allowed_failures[i])
+                if over.size > 0:
+                    tripped = i
+                    end = start + int(over[0]) + 1
+                    test_results = tuple(values[:end - start] for values in test_results)
+                table.fill(i, start, test_results)
+                tested[i] = end
+                failures[i] += len(test_results[2]) - int(numpy.count_nonzero(test_results[2]))
+                start = end
+                batch_size = min(max_batch_size, 2 * batch_size)
+            if tripped is not None:
+                break
+        skipped_runs: int = int(numpy.sum(samples_size - tested))
+        skipped_work: float = float(numpy.dot(samples_size - tested, costs) / numpy.sum(samples_size * costs)) if samples_size > 0 and numpy.sum(costs) > 0 else 0.0
+        report: ScreeningReport = ScreeningReport(samples_size, table, tested, failures, allowed_failures, None if tripped is None else table.test_names[tripped], skipped_runs, skipped_work)
+        self._print_screening_report(report)
+        return report
+
+    def _print_screening_report(self, report: ScreeningReport):
+        print(f'GMT randomness screening (samples size: {report.samples_size})')
+        print("Types of test: \t\t\tPasses: \tTested:")
+        for test_name, test_tested, test_failures in zip(report.table.test_names, report.tested, report.failures):
+            print(f'{test_name} \t\t\t{test_tested - test_failures} \t{test_tested}')
+        if report.passed:
+            print("Completed: no test failed on more samples than allowed.")
+            return
+        i: int = report.table.test_names.index(report.tripped_test)
+        print(f'Stopped: {report.tripped_test} failed on {report.failures[i]} of {report.tested[i]} samples, more than the {report.allowed_failures[i]} allowed.')
+        print(f'Skipped {report.skipped_runs} of {report.samples_size * len(report.table.test_names)} test runs (about {report.skipped_work:.1%} of the work).')
+
+    def run_all_battery_with_stream(self, stream, samples_size: int = None) -> ResultTable:
+        """
+        Run the whole battery on samples read one after another from a stream and print the report.
+        Each sample is tested as soon as it is read and then dropped: only the pass counts and the counts of the Q-values
+        in the sub-intervals are kept, so the memory used does not grow with the size of the samples or their number.
+        :param stream: a binary file object (a file, a pipe such as sys.stdin.buffer, ...) or an iterator of bytes
+        :param samples_size: the number of samples to test (default: until the end of the stream)
+        :return: the pass counts and Q-value counts of every test (the table does not keep the samples)
+        """
+        return self._run_battery_with_stream(stream, self._battery, samples_size)
+
+    def run_battery_by_names_with_stream(self, stream, test_names, samples_size: int = None) -> ResultTable:
+        """
+        Run the named tests of the battery on samples read one after another from a stream and print the report.
+        See run_all_battery_with_stream.
+        :param stream: a binary file object (a file, a pipe such as sys.stdin.buffer, ...) or an iterator of bytes
+        :param test_names: the names of the tests to run
+        :param samples_size: the number of samples to test (default: until the end of the stream)
+        :return: the pass counts and Q-value counts of every test (the table does not keep the samples)
+        """
+        battery: dict = self._battery.subset(test_names)
+        return self._run_battery_with_stream(stream, battery, samples_size)
+
+    def _run_battery_with_stream(self, stream, battery: dict, samples_size: int = None) -> ResultTable:
+        test_units: list = list(battery.values())
+        table: ResultTable = ResultTable([str(test_unit) for test_unit in test_units], intervals_num=self._intervals_num, keep_samples=False)
+        for seq in self._read_sequences_from_stream(stream):
+            # Same kernels as the file mode, on a batch of a single sample
+            tested_samples: int = len(table)
+            for i, test_results in enumerate(_run_tests_on_sequences(test_units, self._bits_length, [seq], self._profiler)):
+                table.fill(i, tested_samples, test_results)
+            if samples_size is not None and len(table) >= samples_size:
+                break
+        self._print_report(table)
+        return table
+
+    def _read_sequences_from_stream(self, stream):
+        """
+        Cut the stream in samples of bits_length / 8 bytes, yielding each one as soon as it is complete.
+        Short reads (pipes) and chunks of any size are put back together. A trailing partial sample is reported and left out.
+        :param stream: a binary file object or an iterator of bytes
+        :return: a generator of samples of packed bytes, wrapped in numpy arrays (ndarray)
+        """
+        buffer_size: int = self._bits_length // 8
+        chunks = iter(functools.partial(stream.read, buffer_size), b"") if hasattr(stream, "read") else stream
+        buffer: bytearray = bytearray()
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= buffer_size:
+                yield numpy.frombuffer(bytes(buffer[:buffer_size]), dtype=numpy.uint8)
+                del buffer[:buffer_size]
+        if len(buffer) != 0:
+            print(f'Ignored a trailing partial sample of {len(buffer)} bytes in the stream (sample size: {buffer_size} bytes).')
+
+
+
+def _run_tests_on_sequences(test_units: list, bits_length: int, sequences, profiler: Profiler = None) -> list:
+    """
+    Run every test unit on every sequence. The sequences are unpacked a batch at a time (about _BATCH_BITS bits)
+    and every test runs on the whole batch with Test.run_batch, so each sequence is unpacked only once whatever the
+    number of tests. The tests of a batch share a SequenceContext, so the representations they have in common are
+    derived only once. This is a module level function so that it can run in a worker process.
+    :param test_units: the list of test units to run
+    :param bits_length: the number of bits in each sequence
+    :param sequences: the sequences of packed bytes
+    :param profiler: the Profiler recording the invocations of the tests, if any
+    :return: for each test unit, its scores, q-values and pass flags on the sequences (see Test.run_batch)
+    """
+    batch_size: int = max(1, _BATCH_BITS // bits_length)
+    results: list = [[] for test_unit in test_units]
+    for start in range(0, len(sequences), batch_size):
+        packed_bytes: numpy.ndarray = numpy.asarray(sequences[start:start + batch_size], dtype=numpy.uint8)
+        bits_matrix: numpy.ndarray = numpy.unpackbits(packed_bytes, axis=1, count=bits_length)
+        # The representations of the batch derived by a test are kept for the following tests
+        context: SequenceContext = SequenceContext(bits_matrix, packed_bytes if bits_length % 8 == 0 else None)
+        for test_unit in test_units:
+            test_unit.prepare_batch(context)
+        for test_results, test_unit in zip(results, test_units):
+            test_results.append(test_unit.run_batch(context, profiler))
+    if len(sequences) == 0:
+        return [(numpy.zeros((0, 1)), numpy.zeros((0, 1)), numpy.zeros(0, dtype=bool)) for test_unit in test_units]
+    return [tuple(numpy.concatenate(arrays) for arrays in zip(*test_results)) for test_results in results]
+
+
+def _run_tests_on_file_chunk(test_units: list, bits_length: int, file_name: str, chunk: tuple, profiler: Profiler = None) -> list:
+    """
+    Map a chunk of samples of the file in memory and run every test unit on them (see _run_tests_on_sequences).
+    :param test_units: the list of test units to run
+    :param bits_length: the number of bits in each sequence
+    :param file_name: the binary file containing the samples
+    :param chunk: the offset in bytes of the first sample of the chunk and the number of samples in it
+    :param profiler: the Profiler recording the invocations of the tests, if any
+    :return: for each test unit, the list of its results on the sequences
+    """
+    offset, samples_size = chunk
+    sequences: numpy.ndarray = numpy.memmap(file_name, dtype=numpy.uint8, mode="r", offset=offset, shape=(samples_size, bits_length // 8))
+    return _run_tests_on_sequences(test_units, bits_length, sequences, profiler)
+
+
+def _run_profiled_chunk(run_chunk, trace_memory: bool, chunk) -> tuple:
+    """
+    Run a chunk in a worker process with a profiler of its own, returned with the results to be merged.
+    :param run_chunk: the function running the test units on a chunk
+    :param trace_memory: whether or not the peak allocation of every invocation is recorded
+    :param chunk: the chunk of sequences
+    :return: the results of run_chunk and the Profiler
+    """
+    profiler: Profiler = Profiler(trace_memory)
+    return run_chunk(chunk, profiler=profiler), profiler
@@ -0,0 +1,212 @@
+#
+# Copyright (C) Guojun Tang 2022
+#
+# Inspired by the work of David Johnston (C) 2017: https://github.com/dj-on-github/sp800_22_tests
+#   and Luca Pasqualini (C) 2019: https://github.com/InsaneMonster/NistRng
+#
+# This work is licensed under a BSD 3-Clause.
+#
+# You should have received a copy of the license along with this
+# work. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
+
+# Import packages
+
+import functools
+import numpy
+
+# Import required src
+
+from gmt_random_test.test import Result
+from gmt_random_test.context import SequenceContext
+from gmt_random_test.config import Battery
+from gmt_random_test.functions import count_overlapping_patterns
+from gmt_random_test.test_unit.test_monobit import MonobitTest
+from gmt_random_test.test_unit.test_runs import RunsTest
+from gmt_random_test.test_unit.test_autocorrelation import AutocorrelationTest
+from gmt_random_test.test_unit.test_binary_derivative import BinaryDerivativeTest
+from gmt_random_test.test_unit.test_serial import SerialTest
+from gmt_random_test.test_unit.test_approximate_entropy import ApproximateEntropyTest
+
+# The tests whose statistics can be updated as the window slides: they only read the ones, autocorrelation,
+# derivative and pattern counts of the context
+MONITORED_TESTS: tuple = (MonobitTest, RunsTest, AutocorrelationTest, BinaryDerivativeTest, SerialTest, ApproximateEntropyTest)
+
+
+def monitor_battery(window_size: int) -> Battery:
+    """
+    The default tests of a monitor, with the parameters of the GM/T batteries.
+    :param window_size: the number of bits of the window
+    :return: the test units by name (see config.Battery)
+    """
+    return Battery({
+        "monobit": (MonobitTest, window_size),
+        "serial_3": (SerialTest, window_size, 3),
+        "serial_5": (SerialTest, window_size, 5),
+        "runs": (RunsTest, window_size),
+        "binary_derivative_3": (BinaryDerivativeTest, window_size, 3),
+        "binary_derivative_7": (BinaryDerivativeTest, window_size, 7),
+        "autocorrelation_1": (AutocorrelationTest, window_size, 1),
+        "autocorrelation_2": (AutocorrelationTest, window_size, 2),
+        "autocorrelation_8": (AutocorrelationTest, window_size, 8),
+        "autocorrelation_16": (AutocorrelationTest, window_size, 16),
+        "approximate_entropy_5": (ApproximateEntropyTest, window_size, 5)
+    })
+
+
+class SlidingWindowMonitor:
+    """
+    Test continuously the output of a generator over a sliding window of its last bits.
+    The bits are consumed a chunk at a time and the statistics of the window (ones, autocorrelation counts, which
+    include the runs, derivative ones and overlapping pattern counts) are updated with the bits entering and leaving
+    it, in a time proportional to the size of the chunk whatever the size of the window. After every chunk the tests
+    are evaluated on these statistics: the P-values are the same as those of the tests run on the bits of the window.
+    Only the tests reading nothing but these statistics can be monitored (see MONITORED_TESTS).
+    Attributes:
+        - window_size: the number of bits of the window
+        - bits_seen: the number of bits consumed so far
+    """
+
+    def __init__(self, window_size: int = 1 << 20, battery: dict = None):
+        """
+        :param window_size: the number of bits of the window
+        :param battery: the test units by name, each built for sequences of window_size bits (default: monitor_battery)
+        """
+        self.window_size: int = window_size
+        self._battery: dict = monitor_battery(window_size) if battery is None else battery
+        for test_unit in self._battery.values():
+            if not isinstance(test_unit, MONITORED_TESTS):
+                raise RuntimeError(f'{test_unit} cannot be monitored.')
+            if test_unit.seq_length != window_size:
+                raise RuntimeError("inapplicable bits length.")
+        # Collect the statistics the tests read
+        requests: SequenceContext = SequenceContext.from_statistics(window_size)
+        for test_unit in self._battery.values():
+            test_unit.prepare_batch(requests)
+        self._lags: list = requests.requested_lags()
+        self._orders: list = requests.requested_orders()
+        self._pattern_length: int = requests.requested_pattern_length()
+        # Bits of the window needed before a bit to update the statistics
+        self._history: int = max(self._lags + self._orders + [self._pattern_length - 1, 0])
+        if window_size <= self._history:
+            raise RuntimeError("inapplicable bits length.")
+        # The window in a ring buffer, starting at _start
+        self._window: numpy.ndarray = numpy.zeros(window_size, dtype=numpy.uint8)
+        self._start: int = 0
+        self._length: int = 0
+        self.bits_seen: int = 0
+        self._reset_statistics()
+
+    @property
+    def battery(self) -> dict:
+        """
+        The monitored test units by name.
+        """
+        return self._battery
+
+    def _reset_statistics(self):
+        self._ones: int = 0
+        self._lags_ones: dict = {lag: 0 for lag in self._lags}
+        self._orders_ones: dict = {order: 0 for order in self._orders}
+        self._pattern_counts: numpy.ndarray = numpy.zeros(2 ** self._pattern_length, dtype=numpy.int64)
+
+    def _window_bits(self, start: int, end: int) -> numpy.ndarray:
+        """
+        Read a range of the window from the ring buffer.
+        :param start: the position of the first bit in the window
+        :param end: the position after the last bit in the window
+        :return: the bits of the range, wrapped in a numpy array (ndarray)
+        """
+        first: int = (self._start + start) % self.window_size
+        if first + end - start <= self.window_size:
+            return self._window[first:first + end - start]
+        return numpy.concatenate((self._window[first:], self._window[:first + end - start - self.window_size]))
+
+    def _update_statistics(self, bits: numpy.ndarray, sign: int, first: int = None, last: int = None):
+        """
+        Add to (or remove from) the statistics the terms (lag pairs, derivative bits, patterns) of some bits: the terms
+        ending at or after the first position, or the terms starting before the last position.
+        :param bits: the bits, wrapped in a numpy array (ndarray)
+        :param sign: 1 to add the terms, -1 to remove them
+        :param first: the position of the first bit whose terms ending there are counted (the bits before it are history)
+        :param last: the position after the last bit whose terms starting there are counted (the bits after it are history)
+        """
+        def segment(span: int) -> numpy.ndarray:
+            # The bits of the terms spanning span + 1 bits
+            return bits[max(first - span, 0):] if first is not None else bits[:last + span]
+
+        for lag in self._lags:
+            lag_bits: numpy.ndarray = segment(lag)
+            self._lags_ones[lag] += sign * int(numpy.count_nonzero(lag_bits[:max(lag_bits.size - lag, 0)] != lag_bits[lag:]))
+        for order in self._orders:
+            derivative: numpy.ndarray = segment(order)
+            for k in range(order):
+                derivative = derivative[1:] ^ derivative[:-1]
+            self._orders_ones[order] += sign * int(numpy.count_nonzero(derivative))
+        if self._pattern_length > 0:
+            self._pattern_counts += sign * count_overlapping_patterns(segment(self._pattern_length - 1), self._pattern_length, wrap=False)
+
+    def update(self, data) -> dict:
+        """
+        Consume a chunk of the stream and evaluate the tests on the window.
+        :param data: the packed bits of the chunk, as bytes or a uint8 numpy array
+        :return: the Result of every test by name on the last window_size bits, or None while fewer bits were consumed
+        """
+        bits: numpy.ndarray = numpy.unpackbits(numpy.frombuffer(data, dtype=numpy.uint8) if isinstance(data, (bytes, bytearray, memoryview)) else numpy.asarray(data, dtype=numpy.uint8))
+        self.bits_seen += bits.size
+        if bits.size >= self.window_size:
+            # The whole window is replaced: start over with its bits
+            bits = bits[bits.size - self.window_size:]
+            self._start, self._length = 0, 0
+            self._reset_statistics()
+        # Remove the terms of the bits leaving the window (the removed pairs, derivative bits and patterns start there)
+        removed: int = max(self._length + bits.size - self.window_size, 0)
+        if removed > 0:
+            leaving: numpy.ndarray = self._window_bits(0, min(removed + self._history, self._length))
+            self._ones -= int(numpy.count_nonzero(leaving[:removed]))
+            self._update_statistics(leaving, -1, last=removed)
+        # Add the terms of the bits entering the window (the added pairs, derivative bits and patterns end there)
+        history: numpy.ndarray = self._window_bits(max(removed, self._length - self._history), self._length)
+        self._ones += int(numpy.count_nonzero(bits))
+        self._update_statistics(numpy.concatenate((history, bits)), 1, first=history.size)
+        # Write the bits over the ones leaving the window
+        end: int = (self._start + self._length) % self.window_size
+        head: int = min(bits.size, self.window_size - end)
+        self._window[end:end + head] = bits[:head]
+        self._window[:bits.size - head] = bits[head:]
+        self._start = (self._start + removed) % self.window_size
+        self._length += bits.size - removed
+        if self._length < self.window_size:
+            return None
+        return self.report()
+
+    def report(self) -> dict:
+        """
+        Evaluate the tests on the statistics of the window.
+        :return: the Result of every test by name
+        """
+        if self._length < self.window_size:
+            raise RuntimeError("the window is not full.")
+        pattern_counts: numpy.ndarray = None
+        if self._pattern_length > 0:
+            # Add the patterns wrapping around the end of the window
+            wrapping: numpy.ndarray = numpy.concatenate((self._window_bits(self.window_size - self._pattern_length + 1, self.window_size), self._window_bits(0, self._pattern_length - 1)))
+            pattern_counts = self._pattern_counts + count_overlapping_patterns(wrapping, self._pattern_length, wrap=False)
+        context: SequenceContext = SequenceContext.from_statistics(self.window_size, self._ones, self._lags_ones, self._orders_ones, pattern_counts)
+        results: dict = {}
+        for name, test_unit in self._battery.items():
+            scores, q_values, passed = test_unit.run_batch(context)
+            results[name] = Result(test_unit.name, bool(passed[0]), scores[0], q_values[0])
+        return results
+
+    def watch(self, stream, chunk_size: int = 1 << 16):
+        """
+        Consume a stream chunk by chunk, yielding the results on the window after every chunk once it is full.
+        :param stream: a binary file object (a file, a pipe such as sys.stdin.buffer, ...) or an iterator of bytes
+        :param chunk_size: the number of bytes read at a time from a file object
+        :return: a generator of the Result of every test by name
+        """
+        chunks = iter(functools.partial(stream.read, chunk_size), b"") if hasattr(stream, "read") else stream
+        for chunk in chunks:
+            results: dict = self.update(chunk)
+            if results is not None:
+                yield results
@@ -0,0 +1,245 @@
+#
+# Copyright (C) Guojun Tang 2022
+#
+# Inspired by the work of David Johnston (C) 2017: https://github.com/dj-on-github/sp800_22_tests
+#   and Luca Pasqualini (C) 2019: https://github.com/InsaneMonster/NistRng
+#
+# This work is licensed under a BSD 3-Clause.
+#
+# You should have received a copy of the license along with this
+# work. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
+
+# Import packages
+
+import numpy
+
+# Number of ones in every byte value
+_POPCOUNT_TABLE: numpy.ndarray = numpy.array([bin(i).count("1") for i in range(256)], dtype=numpy.uint8)
+
+
+class PackedSequence:
+    """
+    Sequence of bits kept packed, eight bits per byte, in the order used by numpy.packbits (the first bit of the
+    sequence is the most significant bit of the first byte).
+    It can be given to Test.run in place of an unpacked numpy array: tests with a packed kernel work on the words
+    directly, the others unpack the sequence first.
+    Attributes:
+        - size: the number of bits in the sequence
+    """
+
+    def __init__(self, data, size: int = None):
+        """
+        :param data: the packed bits, as bytes, a uint8 numpy array or a uint64 numpy array of big-endian words
+        :param size: the number of bits in the sequence (default: every bit of data)
+        """
+        self._bytes: numpy.ndarray = None
+        self._words: numpy.ndarray = None
+        self._bits: numpy.ndarray = None
+        if isinstance(data, numpy.ndarray) and data.dtype == numpy.uint64:
+            self._words = data.ravel()
+            data_size: int = self._words.size * 64
+        else:
+            self._bytes = numpy.frombuffer(data, dtype=numpy.uint8) if isinstance(data, (bytes, bytearray, memoryview)) else numpy.asarray(data, dtype=numpy.uint8).ravel()
+            data_size: int = self._bytes.size * 8
+        self.size: int = data_size if size is None else size
+        if self.size > data_size:
+            raise RuntimeError("not enough packed bits.")
+        if self._words is not None and self.size != data_size:
+            # Keep the invariant that the bits after the end of the sequence are zero
+            self._words = mask_tail(self._words[:(self.size + 63) // 64].copy(), self.size)
+
+    @classmethod
+    def from_bits(cls, bits: numpy.ndarray):
+        """
+        Pack a sequence of unpacked bits.
+        :param bits: the sequence of bits (0 or 1), wrapped in a numpy array (ndarray)
+        :return: the equivalent PackedSequence
+        """
+        return cls(numpy.packbits(bits), bits.size)
+
+    @property
+    def bytes(self) -> numpy.ndarray:
+        """
+        The packed bytes (the bits after the end of the sequence may be set).
+        """
+        if self._bytes is None:
+            self._bytes = self._words.astype(">u8").view(numpy.uint8)
+        return self._bytes
+
+    @property
+    def words(self) -> numpy.ndarray:
+        """
+        The sequence as uint64 words (the first bit is the most significant bit of the first word).
+        The bits after the end of the sequence are always zero.
+        """
+        if self._words is None:
+            words_number: int = (self.size + 63) // 64
+            padded_bytes: numpy.ndarray = numpy.zeros(words_number * 8, dtype=numpy.uint8)
+            padded_bytes[:(self.size + 7) // 8] = self._bytes[:(self.size + 7) // 8]
+            self._words = padded_bytes.view(">u8").astype(numpy.uint64)
+            mask_tail(self._words, self.size)
+        return self._words
+
+    def unpack(self) -> numpy.ndarray:
+        """
+        Unpack the sequence, one bit per byte. The result is computed once and kept.
+        :return: the sequence of bits, wrapped in a numpy array (ndarray)
+        """
+        if self._bits is None:
+            self._bits = numpy.unpackbits(self.bytes, count=self.size)
+        return self._bits
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def popcount(words: numpy.ndarray) -> numpy.ndarray:
+    """
+    Count the ones of every word.
+    :param words: the words, wrapped in a numpy array (ndarray) of unsigned integers
+    :return: the number of ones of every word in a numpy array (ndarray) of the same shape
+    """
+    if hasattr(numpy, "bitwise_count"):
+        return numpy.bitwise_count(words)
+    words = numpy.ascontiguousarray(words)
+    if words.dtype == numpy.uint8:
+        return _POPCOUNT_TABLE[words]
+    byte_counts: numpy.ndarray = _POPCOUNT_TABLE[words.view(numpy.uint8)]
+    return byte_counts.reshape(words.shape + (words.dtype.itemsize,)).sum(axis=-1, dtype=numpy.uint8)
+
+
+def count_ones(words: numpy.ndarray) -> int:
+    """
+    Count the ones in all the words.
+    :param words: the words, wrapped in a numpy array (ndarray) of unsigned integers
+    :return: the total number of ones
+    """
+    return int(numpy.sum(popcount(words), dtype=numpy.int64))
+
+
+def mask_tail(words: numpy.ndarray, size: int) -> numpy.ndarray:
+    """
+    Clear, in place, every bit of the uint64 words from the given bit position to the end.
+    :param words: the uint64 words, wrapped in a numpy array (ndarray)
+    :param size: the number of leading bits to keep
+    :return: the same array
+    """
+    full_words, remainder = divmod(size, 64)
+    if full_words < words.size:
+        if remainder:
+            words[full_words] &= ~numpy.uint64((1 << (64 - remainder)) - 1)
+            words[full_words + 1:] = 0
+        else:
+            words[full_words:] = 0
+    return words
+
+
+def shift_words_left(words: numpy.ndarray, shift: int) -> numpy.ndarray:
+    """
+    Shift a sequence packed in uint64 words towards its beginning, so that bit i of the result is bit i + shift of the
+    input. The bits shifted in at the end are zeros.
+    :param words: the uint64 words, wrapped in a numpy array (ndarray)
+    :param shift: the number of bits to shift by
+    :return: the shifted words in a new numpy array (ndarray)
+    """
+    words_shift, bits_shift = divmod(shift, 64)
+    shifted: numpy.ndarray = numpy.zeros_like(words)
+    if words_shift >= words.size:
+        return shifted
+    shifted[:words.size - words_shift] = words[words_shift:]
+    if bits_shift:
+        shifted <<= numpy.uint64(bits_shift)
+        shifted[:words.size - words_shift - 1] |= words[words_shift + 1:] >> numpy.uint64(64 - bits_shift)
+    return shifted
+
+
+def count_block_ones(packed: PackedSequence, block_size: int, blocks_number: int) -> numpy.ndarray:
+    """
+    Count the ones in each of the first blocks_number consecutive blocks of block_size bits.
+    :param packed: the packed sequence
+    :param block_size: the number of bits in a block
+    :param blocks_number: the number of blocks
+    :return: the number of ones in every block, in a numpy array (ndarray)
+    """
+    if block_size % 8 == 0:
+        blocks: numpy.ndarray = packed.bytes[:blocks_number * (block_size // 8)].reshape(blocks_number, block_size // 8)
+        return numpy.sum(popcount(blocks), axis=1, dtype=numpy.int64)
+    # Ones before every byte boundary, then refine the block boundaries which fall inside a byte
+    byte_ones: numpy.ndarray = numpy.zeros(packed.words.size * 8 + 1, dtype=numpy.int64)
+    padded_bytes: numpy.ndarray = packed.words.astype(">u8").view(numpy.uint8)
+    numpy.cumsum(popcount(padded_bytes), dtype=numpy.int64, out=byte_ones[1:])
+    boundaries: numpy.ndarray = numpy.arange(blocks_number + 1, dtype=numpy.int64) * block_size
+    boundary_bytes: numpy.ndarray = boundaries // 8
+    partial_masks: numpy.ndarray = (0xFF00 >> (boundaries % 8)).astype(numpy.uint8)
+    partial_bytes: numpy.ndarray = numpy.append(padded_bytes, numpy.uint8(0))[boundary_bytes]
+    ones_before: numpy.ndarray = byte_ones[boundary_bytes] + popcount(partial_bytes & partial_masks)
+    return numpy.diff(ones_before)
+
+
+def count_lagged_xor_ones(words: numpy.ndarray, size: int, lags: list, chunk_words: int = 1 << 12) -> numpy.ndarray:
+    """
+    Count, for every lag d, the ones in the XOR of each sequence with itself shifted by d bits, over the first n - d
+    bits. All the lags are computed in a single pass over the words, chunk by chunk, without copying the sequences.
+    :param words: the sequences as uint64 words, one per row of a 2D numpy array (ndarray), with the bits after the end zero
+    :param size: the number of bits n in every sequence
+    :param lags: the lags d, each from 1 to n
+    :param chunk_words: the number of words of a row processed at a time
+    :return: the number of ones of every row (first axis) and lag (second axis), in a 2D numpy array (ndarray)
+    """
+    rows_number, words_number = words.shape
+    counts: numpy.ndarray = numpy.zeros((rows_number, len(lags)), dtype=numpy.int64)
+    # Zero words after the end, so that the shifted words can always be read
+    padding: int = (max(lags, default=0) + 63) // 64 + 1
+    padded: numpy.ndarray = numpy.concatenate((words, numpy.zeros((rows_number, padding), dtype=numpy.uint64)), axis=1)
+    for start in range(0, words_number, chunk_words):
+        end: int = min(start + chunk_words, words_number)
+        chunk: numpy.ndarray = padded[:, start:end]
+        for index, lag in enumerate(lags):
+            words_shift, bits_shift = divmod(lag, 64)
+            shifted: numpy.ndarray = padded[:, start + words_shift:end + words_shift]
+            if bits_shift:
+                shifted = (shifted << numpy.uint64(bits_shift)) | (padded[:, start + words_shift + 1:end + words_shift + 1] >> numpy.uint64(64 - bits_shift))
+            counts[:, index] += numpy.sum(popcount(chunk ^ shifted), axis=1, dtype=numpy.int64)
+    # The last d bits were XORed with the zeros after the end: remove their ones
+    for index, lag in enumerate(lags):
+        first_word, first_bit = divmod(size - lag, 64)
+        tail: numpy.ndarray = words[:, first_word:].copy()
+        if tail.shape[1] > 0:
+            tail[:, 0] &= numpy.uint64((1 << (64 - first_bit)) - 1)
+        counts[:, index] -= numpy.sum(popcount(tail), axis=1, dtype=numpy.int64)
+    return counts
+
+
+def count_derivative_ones(words: numpy.ndarray, size: int, orders: list, chunk_words: int = 1 << 12) -> numpy.ndarray:
+    """
+    Count, for every order k, the ones in the k-th binary derivative of each sequence (the XOR of adjacent bits taken
+    k times, n - k bits long). The derivatives are built one after the other in place on a single copy of the words,
+    so the extra memory does not grow with the number of orders.
+    :param words: the sequences as uint64 words, one per row of a 2D numpy array (ndarray), with the bits after the end zero
+    :param size: the number of bits n in every sequence
+    :param orders: the orders k, each from 1 to n - 1
+    :param chunk_words: the number of words of a row processed at a time
+    :return: the number of ones of every row (first axis) and order (second axis), in a 2D numpy array (ndarray)
+    """
+    rows_number, words_number = words.shape
+    counts: numpy.ndarray = numpy.zeros((rows_number, len(orders)), dtype=numpy.int64)
+    # A zero word after the end keeps the bits after the end zero through the derivatives
+    derivative: numpy.ndarray = numpy.concatenate((words, numpy.zeros((rows_number, 1), dtype=numpy.uint64)), axis=1)
+    for order in range(1, max(orders, default=0) + 1):
+        indexes: list = [index for index, requested_order in enumerate(orders) if requested_order == order]
+        ones: numpy.ndarray = numpy.zeros(rows_number, dtype=numpy.int64)
+        for start in range(0, words_number, chunk_words):
+            end: int = min(start + chunk_words, words_number)
+            # Bit i becomes bit i XOR bit i + 1, the first bit of the next chunk is read before that chunk changes
+            chunk: numpy.ndarray = derivative[:, start:end]
+            chunk ^= (chunk << numpy.uint64(1)) | (derivative[:, start + 1:end + 1] >> numpy.uint64(63))
+            if indexes:
+                ones += numpy.sum(popcount(chunk), axis=1, dtype=numpy.int64)
+        if indexes:
+            # Only the first n - k bits belong to the derivative: remove the ones of the last k bits
+            first_word, first_bit = divmod(size - order, 64)
+            tail: numpy.ndarray = derivative[:, first_word:words_number].copy()
+            if tail.shape[1] > 0:
+                tail[:, 0] &= numpy.uint64((1 << (64 - first_bit)) - 1)
+            counts[:, indexes] = (ones - numpy.sum(popcount(tail), axis=1, dtype=numpy.int64))[:, numpy.newaxis]
+    return counts
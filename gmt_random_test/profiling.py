@@ -0,0 +1,184 @@
+#
+# Copyright (C) Guojun Tang 2022
+#
+# Inspired by the work of David Johnston (C) 2017: https://github.com/dj-on-github/sp800_22_tests
+#   and Luca Pasqualini (C) 2019: https://github.com/InsaneMonster/NistRng
+#
+# This work is licensed under a BSD 3-Clause.
+#
+# You should have received a copy of the license along with this
+# work. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
+
+# Import packages
+
+import contextlib
+import time
+
+import numpy
+
+
+class Measurement:
+    """
+    The duration of an invocation measured in a with block (see measure), set when the block exits.
+    Attributes:
+        - duration: the duration in nanoseconds (time.perf_counter_ns), None until the block exits.
+    """
+
+    __slots__ = ("duration",)
+
+    def __init__(self):
+        self.duration: int = None
+
+
+class Profiler:
+    """
+    Records the duration (time.perf_counter_ns) of every invocation of the tests and, optionally, the peak of the
+    memory allocated during it (tracemalloc) and a cProfile profile of the chosen tests.
+    In a battery a test is invoked once per batch of samples, and its duration includes the representations of the
+    batch it is the first to ask for (see SequenceContext).
+    Attributes:
+        - trace_memory: whether or not the peak allocation of every invocation is recorded.
+        - profiled_tests: the names of the tests run under cProfile.
+    """
+
+    def __init__(self,
+                 trace_memory: bool = False, profiled_tests=()):
+        """
+        :param trace_memory: record the peak allocation of every invocation (tracemalloc slows the tests down)
+        :param profiled_tests: the names of the tests to run under cProfile (as printed in the report, e.g. "Poker (m=8)")
+        """
+        self.trace_memory: bool = trace_memory
+        self.profiled_tests: set = set(profiled_tests)
+        self._durations: dict = {}
+        self._samples: dict = {}
+        self._peaks: dict = {}
+        self._profiles: dict = {}
+
+    @contextlib.contextmanager
+    def measure(self, name: str, samples_size: int = 1):
+        """
+        Measure the invocation of a test run in the with block.
+        :param name: the name of the test
+        :param samples_size: the number of samples tested by the invocation
+        :return: the Measurement of the invocation, as the target of the with statement
+        """
+        # Imported here: a battery run without profiling does not pay for them
+        import cProfile
+        import tracemalloc
+        tracing: bool = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+        profile: cProfile.Profile = None
+        if name in self.profiled_tests:
+            profile = self._profiles.setdefault(name, cProfile.Profile())
+            profile.enable()
+        measurement: Measurement = Measurement()
+        start: int = time.perf_counter_ns()
+        try:
+            yield measurement
+        finally:
+            measurement.duration = time.perf_counter_ns() - start
+            if profile is not None:
+                profile.disable()
+            peak: int = None
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                if tracing:
+                    tracemalloc.stop()
+            self.record(name, measurement.duration, samples_size, peak)
+
+    def record(self, name: str, duration: int, samples_size: int = 1, peak: int = None):
+        """
+        Record an invocation of a test.
+        :param name: the name of the test
+        :param duration: the duration of the invocation in nanoseconds
+        :param samples_size: the number of samples tested by the invocation
+        :param peak: the peak allocation during the invocation in bytes, if traced
+        """
+        self._durations.setdefault(name, []).append(duration)
+        self._samples[name] = self._samples.get(name, 0) + samples_size
+        if peak is not None:
+            self._peaks[name] = max(self._peaks.get(name, 0), peak)
+
+    def merge(self, other):
+        """
+        Add the invocations recorded by another profiler (e.g. in a worker process) to this one.
+        The cProfile profiles are not merged.
+        :param other: the other Profiler
+        """
+        for name, durations in other._durations.items():
+            self._durations.setdefault(name, []).extend(durations)
+            self._samples[name] = self._samples.get(name, 0) + other._samples[name]
+        for name, peak in other._peaks.items():
+            self._peaks[name] = max(self._peaks.get(name, 0), peak)
+
+    def aggregates(self) -> dict:
+        """
+        Aggregate the invocations of every test.
+        :return: for every test name, the number of invocations and of samples, the total, mean and p50/p95/p99
+                 durations of an invocation and the mean duration per sample in nanoseconds, and the peak allocation
+                 in bytes if traced
+        """
+        aggregates: dict = {}
+        for name, durations in self._durations.items():
+            durations_array: numpy.ndarray = numpy.array(durations, dtype=numpy.int64)
+            p50, p95, p99 = numpy.percentile(durations_array, [50, 95, 99])
+            aggregates[name] = {
+                "count": durations_array.size,
+                "samples": self._samples[name],
+                "total_ns": int(numpy.sum(durations_array)),
+                "mean_ns": float(numpy.mean(durations_array)),
+                "p50_ns": float(p50),
+                "p95_ns": float(p95),
+                "p99_ns": float(p99),
+                "per_sample_ns": float(numpy.sum(durations_array)) / max(self._samples[name], 1),
+                "peak_bytes": self._peaks.get(name),
+            }
+        return aggregates
+
+    def stats(self, name: str):
+        """
+        :param name: the name of a test run under cProfile
+        :return: the statistics of its profile (pstats.Stats)
+        """
+        import pstats
+        if name not in self._profiles:
+            raise RuntimeError("test not profiled.")
+        return pstats.Stats(self._profiles[name])
+
+    def print_report(self):
+        total: int = sum(int(numpy.sum(durations)) for durations in self._durations.values())
+        print("Test profile: \t\t\tCalls: \tTotal (ms): \tShare: \tp50 (ms): \tp95 (ms): \tp99 (ms): \tPeak (MiB):")
+        for name, aggregate in sorted(self.aggregates().items(), key=lambda item: -item[1]["total_ns"]):
+            peak: str = "-" if aggregate["peak_bytes"] is None else f'{aggregate["peak_bytes"] / 2 ** 20:.1f}'
+            print(f'{name} \t\t\t{aggregate["count"]} \t{aggregate["total_ns"] / 1e6:.3f} \t{aggregate["total_ns"] / max(total, 1):.1%} '
+                  f'\t{aggregate["p50_ns"] / 1e6:.3f} \t{aggregate["p95_ns"] / 1e6:.3f} \t{aggregate["p99_ns"] / 1e6:.3f} \t{peak}')
+
+
+def measure(profiler: Profiler, name: str, samples_size: int = 1):
+    """
+    Measure the invocation of a test with the profiler, if any. Without a profiler only the duration is measured.
+    :param profiler: the Profiler, or None not to record anything
+    :param name: the name of the test
+    :param samples_size: the number of samples tested by the invocation
+    :return: a context manager giving the Measurement of the invocation
+    """
+    if profiler is None:
+        return _measure_duration()
+    return profiler.measure(name, samples_size)
+
+
+@contextlib.contextmanager
+def _measure_duration():
+    """
+    Measure the duration of the with block.
+    :return: the Measurement of the block, as the target of the with statement
+    """
+    measurement: Measurement = Measurement()
+    start: int = time.perf_counter_ns()
+    try:
+        yield measurement
+    finally:
+        measurement.duration = time.perf_counter_ns() - start
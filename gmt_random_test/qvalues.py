@@ -10,7 +10,80 @@
 # work. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 
 import numpy
-import scipy
+
+
+def interval_counts(q_values: numpy.ndarray, intervals_num: int) -> numpy.ndarray:
+    """
+    Count the Q-values falling in each of the fixed sub-intervals [0, 1/k), [1/k, 2/k), ..., [(k-1)/k, 1] of GM/T.
+    :param q_values: the Q-values, wrapped in a numpy array (ndarray); NaN values are not counted
+    :param intervals_num: the number k of sub-intervals
+    :return: the count of every sub-interval, in a numpy array (ndarray)
+    """
+    q_values = q_values[~numpy.isnan(q_values)]
+    indexes: numpy.ndarray = numpy.minimum((q_values * intervals_num).astype(numpy.int64), intervals_num - 1)
+    return numpy.bincount(indexes, minlength=intervals_num)
+
+
+def uniformity_scores(counts: numpy.ndarray) -> numpy.ndarray:
+    """
+    Compute the uniformity score of the Q-values of every row of sub-interval counts with a single chi-square
+    evaluation: gammaincc((k - 1) / 2, chi_square / 2).
+    :param counts: the counts of the k sub-intervals, on the last axis of a numpy array (ndarray)
+    :return: the score of every row, NaN for the rows without Q-values, in a numpy array (ndarray)
+    """
+    import scipy.special
+    intervals_num: int = counts.shape[-1]
+    expected: numpy.ndarray = numpy.sum(counts, axis=-1, keepdims=True) / intervals_num
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        chi_square: numpy.ndarray = numpy.sum((counts - expected) ** 2 / expected, axis=-1)
+    return scipy.special.gammaincc((intervals_num - 1) / 2.0, chi_square / 2.0)
+
+
+class QValueAccumulator:
+    """
+    Counts of the Q-values of a battery in the fixed sub-intervals of GM/T (see interval_counts), for every pair of a
+    test and a Q-value index: the rows of a 2D integer array. The Q-values are counted as the results arrive and then
+    dropped, so the memory used does not depend on the number of samples.
+    Attributes:
+        - intervals_num: the number k of sub-intervals
+        - counts: the counts, in a (pairs, k) numpy array (ndarray)
+    """
+
+    __slots__ = ("intervals_num", "counts")
+
+    def __init__(self,
+                 pairs_number: int, intervals_num: int = 10):
+        """
+        :param pairs_number: the number of (test, Q-value index) pairs
+        :param intervals_num: the number k of sub-intervals
+        """
+        self.intervals_num: int = intervals_num
+        self.counts: numpy.ndarray = numpy.zeros((pairs_number, intervals_num), dtype=numpy.int64)
+
+    def add(self, first_pair: int, q_values: numpy.ndarray):
+        """
+        Count the Q-values of some samples.
+        :param first_pair: the pair of the first column of Q-values, the following columns go to the following pairs
+        :param q_values: the Q-values of the samples, one column per pair, wrapped in a 2D numpy array (ndarray);
+                         NaN values are not counted
+        """
+        valid: numpy.ndarray = ~numpy.isnan(q_values)
+        indexes: numpy.ndarray = numpy.minimum((numpy.where(valid, q_values, 0.0) * self.intervals_num).astype(numpy.int64), self.intervals_num - 1)
+        indexes += (first_pair + numpy.arange(q_values.shape[1], dtype=numpy.int64)) * self.intervals_num
+        self.counts += numpy.bincount(indexes[valid], minlength=self.counts.size).reshape(self.counts.shape)
+
+    def samples(self) -> numpy.ndarray:
+        """
+        :return: the number of Q-values counted for every pair, in a numpy array (ndarray)
+        """
+        return numpy.sum(self.counts, axis=1)
+
+    def scores(self) -> numpy.ndarray:
+        """
+        :return: the uniformity score of every pair (NaN for the pairs without Q-values), in a numpy array (ndarray)
+        """
+        return uniformity_scores(self.counts)
+
 
 class QValueCollector():
 
@@ -26,9 +99,7 @@ class QValueCollector():
     '''
     @staticmethod 
     def compute_value(q_values_list: numpy.ndarray, intervals_num: int) -> float:
-        samples_num: int = q_values_list.size
-        frequencies: numpy.ndarray = numpy.histogram(q_values_list * intervals_num, intervals_num)[0]
-        chi_square: float = numpy.sum((frequencies - samples_num / intervals_num) ** 2 / (samples_num / intervals_num))
-        score: float = scipy.special.gammaincc((intervals_num - 1) / 2.0, chi_square / 2.0)
+        # Fixed sub-intervals of [0, 1], not relative to the smallest and largest Q-values
+        score: float = float(uniformity_scores(interval_counts(q_values_list, intervals_num)))
         return score
         
\ No newline at end of file
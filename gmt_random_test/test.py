@@ -11,7 +11,11 @@
 # Import packages
 
 import numpy
-import time
+
+from gmt_random_test.packed import PackedSequence
+from gmt_random_test.context import SequenceContext
+from gmt_random_test.profiling import Profiler, measure
+from gmt_random_test.qvalues import QValueAccumulator
 
 
 # Define result class
@@ -26,6 +30,8 @@ class Result:
         - q_value: the q value result (in some test, there will be more than one q values).
     """
 
+    __slots__ = ("_test_name", "_success", "_score_list", "_q_value_list")
+
     def __init__(self,
                  test_name: str,
                  success: bool, score_list: numpy.ndarray, q_value_list: numpy.ndarray):
@@ -54,6 +60,127 @@ class Result:
         return self._q_value_list
 
 
+class ResultTable:
+    """
+    Columnar results of a battery: the scores, q values and pass flags of every sample (first axis) and test (second
+    axis) kept in preallocated arrays, instead of a Result object per sample and test.
+    A test gives at most VALUES_NUMBER scores and q values per sample; the values a test does not give are NaN.
+    The pass counts and the counts of the q values in the sub-intervals of the uniformity test (see
+    qvalues.QValueAccumulator) are updated as the results are filled. A table not keeping the samples only keeps
+    those counts, so its memory does not grow with the number of samples.
+    Attributes:
+        - test_names: the names of the tests, in the order of the second axis.
+        - scores: the scores (p values), in a (samples, tests, VALUES_NUMBER) numpy array (ndarray).
+        - q_values: the q values, in a (samples, tests, VALUES_NUMBER) numpy array (ndarray).
+        - passed: whether or not each sample passed each test, in a (samples, tests) numpy array (ndarray).
+        - q_value_counts: the q values counts of every (test, q value index) pair, the pair of the j-th q value of
+          test i being i * VALUES_NUMBER + j.
+    """
+
+    VALUES_NUMBER: int = 2
+
+    __slots__ = ("test_names", "q_value_counts", "_scores", "_q_values", "_passed", "_passes", "_values_numbers", "_samples_size", "_keep_samples")
+
+    def __init__(self,
+                 test_names: list, samples_size: int = 0, intervals_num: int = 10, keep_samples: bool = True):
+        """
+        :param test_names: the names of the tests
+        :param samples_size: the number of samples to allocate room for (the table grows if more are filled)
+        :param intervals_num: the number of sub-intervals the q values are counted in
+        :param keep_samples: whether or not the scores, q values and pass flags of every sample are kept
+        """
+        self.test_names: list = list(test_names)
+        self.q_value_counts: QValueAccumulator = QValueAccumulator(len(self.test_names) * self.VALUES_NUMBER, intervals_num)
+        self._keep_samples: bool = keep_samples
+        if not keep_samples:
+            samples_size = 0
+        self._scores: numpy.ndarray = numpy.full((samples_size, len(self.test_names), self.VALUES_NUMBER), numpy.nan)
+        self._q_values: numpy.ndarray = numpy.full((samples_size, len(self.test_names), self.VALUES_NUMBER), numpy.nan)
+        self._passed: numpy.ndarray = numpy.zeros((samples_size, len(self.test_names)), dtype=bool)
+        self._passes: numpy.ndarray = numpy.zeros(len(self.test_names), dtype=numpy.int64)
+        self._values_numbers: numpy.ndarray = numpy.zeros(len(self.test_names), dtype=numpy.int64)
+        self._samples_size: int = 0
+
+    def __len__(self) -> int:
+        return self._samples_size
+
+    def __repr__(self) -> str:
+        return f'ResultTable(samples: {len(self)}; tests: {self.test_names})'
+
+    @property
+    def scores(self) -> numpy.ndarray:
+        return self._scores[:self._samples_size]
+
+    @property
+    def q_values(self) -> numpy.ndarray:
+        return self._q_values[:self._samples_size]
+
+    @property
+    def passed(self) -> numpy.ndarray:
+        return self._passed[:self._samples_size]
+
+    def values_number(self, index: int) -> int:
+        """
+        :param index: the index of the test
+        :return: the number of scores (and q values) the test gives per sample
+        """
+        return int(self._values_numbers[index])
+
+    def fill(self, index: int, start: int, test_results: tuple):
+        """
+        Store, in place, the results of a test on consecutive samples.
+        :param index: the index of the test
+        :param start: the index of the first sample
+        :param test_results: the scores, q values and pass flags of the samples, as returned by Test.run_batch
+        """
+        scores, q_values, passed = test_results
+        end: int = start + len(passed)
+        if scores.shape[1] > self.VALUES_NUMBER or q_values.shape[1] > self.VALUES_NUMBER:
+            raise RuntimeError("too many values per sample.")
+        if self._keep_samples:
+            if end > self._passed.shape[0]:
+                self._reserve(max(end, 2 * self._passed.shape[0]))
+            self._scores[start:end, index, :scores.shape[1]] = scores
+            self._q_values[start:end, index, :q_values.shape[1]] = q_values
+            self._passed[start:end, index] = passed
+        self._passes[index] += numpy.count_nonzero(passed)
+        self.q_value_counts.add(index * self.VALUES_NUMBER, q_values)
+        self._values_numbers[index] = max(self._values_numbers[index], q_values.shape[1])
+        self._samples_size = max(self._samples_size, end)
+
+    def _reserve(self, samples_size: int):
+        """
+        Grow the arrays to hold the given number of samples.
+        :param samples_size: the new number of samples
+        """
+        added_size: int = samples_size - self._passed.shape[0]
+        self._scores = numpy.concatenate((self._scores, numpy.full((added_size,) + self._scores.shape[1:], numpy.nan)))
+        self._q_values = numpy.concatenate((self._q_values, numpy.full((added_size,) + self._q_values.shape[1:], numpy.nan)))
+        self._passed = numpy.concatenate((self._passed, numpy.zeros((added_size,) + self._passed.shape[1:], dtype=bool)))
+
+    def passes(self) -> numpy.ndarray:
+        """
+        :return: the number of samples passing each test, in a numpy array (ndarray)
+        """
+        return self._passes.copy()
+
+    def q_value_columns(self, index: int) -> list:
+        """
+        :param index: the index of the test
+        :return: the q values of all the samples, one numpy array (ndarray) per q value of the test (empty if the
+                 table does not keep the samples)
+        """
+        return [self.q_values[:, index, j] for j in range(self.values_number(index))]
+
+    def q_value_scores(self) -> list:
+        """
+        Compute the uniformity scores of the q values of all the tests at once.
+        :return: for each test, the scores of its q values, wrapped in a numpy array (ndarray)
+        """
+        scores: numpy.ndarray = self.q_value_counts.scores().reshape((len(self.test_names), self.VALUES_NUMBER))
+        return [scores[index, :self.values_number(index)] for index in range(len(self.test_names))]
+
+
 # Define base abstract test class
 
 class Test:
@@ -67,6 +194,9 @@ class Test:
         - significance_value: represent the threshold value for the score.
     """
 
+    # Relative cost of testing a bit (see estimated_cost), about the nanoseconds a batch takes per bit
+    BIT_COST: float = 1.0
+
     def __init__(self,
                  name: str,
                  significance_value: float,
@@ -75,6 +205,14 @@ class Test:
         self.seq_length: int = seq_length 
         self.significance_value: float = significance_value
 
+    def estimated_cost(self) -> float:
+        """
+        Estimate the cost of running the test on a sequence, relative to the other tests, without running it.
+        By default the cost grows with the length of the sequences, at BIT_COST per bit.
+        :return: the estimated cost
+        """
+        return self.BIT_COST * self.seq_length
+
     def _execute(self,
                  bits: numpy.ndarray) -> Result:
         """
@@ -85,20 +223,85 @@ class Test:
         # Abstract method, definition should be implemented on a child class basis
         raise NotImplementedError()
 
+    def _execute_packed(self,
+                        packed: PackedSequence) -> Result:
+        """
+        Execute the test on a packed sequence of bits returning a Result object upon completion.
+        Tests with a kernel working on the packed words override this method, by default the sequence is unpacked.
+        :param packed: the packed sequence of bits on which to run the test
+        :return: a Result object stating the outcome of the test
+        """
+        return self._execute(packed.unpack())
+
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Execute the test on every sequence of a context.
+        Tests with a vectorized kernel override this method, reading the representations they need from the context
+        so that the ones shared with other tests are computed once. By default the sequences are tested one by one.
+        :param context: the sequences of bits and their shared representations
+        :return: the scores and the q-values of every sequence, each wrapped in a 2D numpy array (ndarray)
+        """
+        results: list = [self._execute(bits) for bits in context.bits]
+        scores: numpy.ndarray = numpy.array([result.score for result in results], dtype=float)
+        q_values: numpy.ndarray = numpy.array([result.q_value for result in results], dtype=float)
+        return scores, q_values
+
+    def prepare_batch(self,
+                      context: SequenceContext):
+        """
+        Declare to the context the representations the test will read, before the tests sharing the context run, so
+        that the representations several tests need can be computed together. By default nothing is declared.
+        :param context: the sequences of bits and their shared representations
+        """
+        pass
+
     def run(self,
-            bits: numpy.ndarray):
+            bits, profiler: Profiler = None):
         """
         Run the test on the given sequence of bits, returning a Result object and the elapsed time upon completion.
-        :param bits: the sequence of bits on which to run the test, wrapped in a numpy array (ndarray)
-        :return: a Result object stating the outcome of the test and the elapsed time in milliseconds
+        :param bits: the sequence of bits on which to run the test, wrapped in a numpy array (ndarray) or a PackedSequence
+        :param profiler: the Profiler recording the invocation, if any
+        :return: a Result object stating the outcome of the test and the elapsed time of the test in milliseconds, as
+                 a float (measured with time.perf_counter_ns, formerly whole milliseconds of time.time)
         """
-        start_time: int = int(round(time.time() * 1000))
         if(not self.is_eligible(bits)):
             raise Exception("Tested sequence is not eligible.")
-        result: Result = self._execute(bits)
-        end_time: int = int(round(time.time() * 1000))
-        return result, end_time - start_time
+        # A single clock: the duration recorded by the profiler is the one returned
+        with measure(profiler, str(self)) as measurement:
+            if isinstance(bits, PackedSequence):
+                result: Result = self._execute_packed(bits)
+            else:
+                result: Result = self._execute(bits)
+        return result, measurement.duration / 1e6
     
+    def run_batch(self,
+                  bits_matrix, profiler: Profiler = None) -> tuple:
+        """
+        Run the test on every row of a matrix of sequences of bits, returning the results as arrays.
+        The statistics are computed along the rows and the P-values evaluated once for all the rows. They agree
+        with the ones returned by run up to floating point rounding (a few units in the last place).
+        To run several tests on the same sequences, give them the same SequenceContext: the representations of the
+        sequences the tests have in common are then computed only once.
+        :param bits_matrix: the sequences of bits, one per row, wrapped in a 2D numpy array (ndarray) of shape (N, seq_length) or a SequenceContext
+        :param profiler: the Profiler recording the invocation, if any
+        :return: the scores (N, number of P-values), the q-values (N, number of Q-values) and the pass flags (N,) of the rows
+        """
+        if not isinstance(bits_matrix, SequenceContext) and bits_matrix.ndim != 2:
+            raise Exception("Tested sequences are not eligible.")
+        context: SequenceContext = bits_matrix if isinstance(bits_matrix, SequenceContext) else SequenceContext(bits_matrix)
+        if context.size != self.seq_length:
+            raise Exception("Tested sequences are not eligible.")
+        with measure(profiler, str(self), len(context)):
+            scores, q_values = self._execute_batch(context)
+        # Kernels with a single P-value may return 1D arrays
+        if scores.ndim == 1:
+            scores = scores[:, numpy.newaxis]
+        if q_values.ndim == 1:
+            q_values = q_values[:, numpy.newaxis]
+        passed: numpy.ndarray = numpy.all(scores >= self.significance_value, axis=1)
+        return scores, q_values, passed
+
     def _length_check(self,
                       bits: numpy.ndarray) -> bool:
         return bits.size == self.seq_length
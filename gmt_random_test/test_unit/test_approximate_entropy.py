@@ -13,11 +13,12 @@
 
 import numpy
 import math
-import scipy.special
 
 # Import required src
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
+from gmt_random_test.functions import count_overlapping_patterns, marginalize_pattern_counts
 
 
 class ApproximateEntropyTest(Test):
@@ -29,9 +30,9 @@ class ApproximateEntropyTest(Test):
     The significance value of the test is 0.01.
     """
 
+    BIT_COST: float = 12.0
+
     def __init__(self, seq_length: int, block_length = 2):
-        # Define specific test attributes
-        self._pattern_length: int = 2
         # Define attributes
         self._blocks_length: int = block_length
         # Generate base Test class
@@ -42,25 +43,12 @@ class ApproximateEntropyTest(Test):
         """
         Overridden method of Test class: check its docstring for further information.
         """
-        # Define Phi-m statistics list
-        phi_m = []
-        for iteration in range(self._blocks_length, self._blocks_length + 2):
-            # Compute the padded sequence of bits
-            padded_bits: numpy.ndarray = numpy.concatenate((bits, bits[0:iteration - 1]))
-            # Compute the frequency count
-            counts: numpy.ndarray = numpy.zeros(2 ** iteration, dtype=int)
-            for i in range(2 ** iteration):
-                count: int = 0
-                for j in range(bits.size):
-                    if self._pattern_to_int(padded_bits[j:j + iteration]) == i:
-                        count += 1
-                counts[i] = count
-            # Compute C-i as the average of counts on the number of bits
-            c_i: numpy.ndarray = counts[:] / float(bits.size)
-            # Compute Phi-m based on C-i
-            phi_m.append(numpy.sum(c_i[c_i > 0.0] * numpy.log((c_i[c_i > 0.0] / 10.0))))
+        import scipy.special
+        # Compute the frequency count of the overlapping patterns (with wraparound padding), once for the longer patterns
+        counts_m_1: numpy.ndarray = count_overlapping_patterns(bits, self._blocks_length + 1)
+        counts: list = [marginalize_pattern_counts(counts_m_1, self._blocks_length), counts_m_1]
         # Compute Chi-Square from the computed statistics
-        chi_square: float = 2 * bits.size * (math.log(2) - (phi_m[0] - phi_m[1]))
+        chi_square: float = self._compute_chi_square(counts, bits.size)
         # Compute the score (P-value)
         score: float = scipy.special.gammaincc(2 ** (self._blocks_length - 1), (chi_square / 2.0))
         q_value: float = score
@@ -69,18 +57,44 @@ class ApproximateEntropyTest(Test):
             return Result(self.name, True, numpy.array([score]), numpy.array([q_value]))
         return Result(self.name, False, numpy.array([score]), numpy.array([q_value]))
 
+    def prepare_batch(self,
+                      context: SequenceContext):
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        context.request_pattern_length(self._blocks_length + 1)
 
-    def __repr__(self) -> str:
-        return f'{self.name} (m={self._blocks_length})'
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        import scipy.special
+        # The counts of the overlapping patterns of every row are shared with the other tests on the same sequences
+        counts: list = [context.pattern_counts(iteration) for iteration in range(self._blocks_length, self._blocks_length + 2)]
+        chi_square: numpy.ndarray = self._compute_chi_square(counts, context.size)
+        # Compute scores (P-values) of all the rows at once, q_value = p_value
+        scores: numpy.ndarray = scipy.special.gammaincc(2 ** (self._blocks_length - 1), (chi_square / 2.0))
+        return scores, scores.copy()
 
     @staticmethod
-    def _pattern_to_int(bit_pattern: numpy.ndarray) -> int:
+    def _compute_chi_square(counts: list, sequence_size: int) -> float:
         """
-        Convert the given pattern of bits to an integer value.
-        :param bit_pattern: the bit pattern to convert
-        :return: the integer value identifying the pattern
+        Compute Chi-Square given the counts of the overlapping patterns of length m and m + 1.
+        :param counts: the counts of the patterns of length m and m + 1, each wrapped in a numpy array (ndarray) whose last axis are the patterns
+        :param sequence_size: the size of the sequence of bits
+        :return: the float value of Chi-Square (or a numpy array of them for every row)
         """
-        result: int = 0
-        for bit in bit_pattern:
-            result = (result << 1) + bit
-        return result
\ No newline at end of file
+        # Define Phi-m statistics list
+        phi_m = []
+        for counts_m in counts:
+            # Compute C-i as the average of counts on the number of bits
+            c_i: numpy.ndarray = counts_m[:] / float(sequence_size)
+            # Compute Phi-m based on C-i, the patterns never seen do not contribute to the sum
+            logs: numpy.ndarray = numpy.log(c_i / 10.0, out=numpy.zeros_like(c_i), where=(c_i > 0.0))
+            phi_m.append(numpy.sum(c_i * logs, axis=-1))
+        # Compute Chi-Square from the computed statistics
+        return 2 * sequence_size * (math.log(2) - (phi_m[0] - phi_m[1]))
+
+    def __repr__(self) -> str:
+        return f'{self.name} (m={self._blocks_length})'
@@ -17,6 +17,8 @@ import math
 # Import required src
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
+from gmt_random_test.packed import PackedSequence, count_ones, mask_tail, shift_words_left
 
 
 class AutocorrelationTest(Test):
@@ -38,13 +40,50 @@ class AutocorrelationTest(Test):
         """
         Overridden method of Test class: check its docstring for further information.
         """
-        original_vector : numpy.ndarray = bits[:bits.size - self._shift]
-        shifted_vector: numpy.ndarray = numpy.roll(bits, -self._shift)[:bits.size - self._shift]
-        result_vector: numpy.ndarray = numpy.bitwise_xor(original_vector, shifted_vector)
-        # Compute ones int result vector
-        ones: int = numpy.count_nonzero(result_vector)
+        # Compute ones of the XOR of the first n - d bits and the last n - d bits (the sequence shifted by d bits)
+        ones: int = numpy.count_nonzero(bits[:bits.size - self._shift] != bits[self._shift:])
+        return self._compute_result(ones, bits.size)
 
-        tmp: float = 2 * (ones - (bits.size - self._shift) / 2.0)  / math.sqrt(bits.size - self._shift)
+    def _execute_packed(self,
+                        packed: PackedSequence):
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        # XOR the packed words with themselves shifted by d bits and count the ones of the first n - d bits
+        result_words: numpy.ndarray = numpy.bitwise_xor(packed.words, shift_words_left(packed.words, self._shift))
+        ones: int = count_ones(mask_tail(result_words, packed.size - self._shift))
+        return self._compute_result(ones, packed.size)
+
+    def prepare_batch(self,
+                      context: SequenceContext):
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        context.request_autocorrelation_lag(self._shift)
+
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        import scipy.special
+        size: int = context.size
+        # Count the positions where every row differs from itself shifted by d bits, together with the other lags
+        ones: numpy.ndarray = context.autocorrelation_ones(self._shift)
+        tmp: numpy.ndarray = 2 * (ones - (size - self._shift) / 2.0) / math.sqrt(size - self._shift)
+        # Compute scores and q_values of all the rows at once
+        scores: numpy.ndarray = scipy.special.erfc(numpy.abs(tmp) / (math.sqrt(2.0)))
+        q_values: numpy.ndarray = scipy.special.erfc(tmp / (math.sqrt(2.0))) / 2.0
+        return scores, q_values
+
+    def _compute_result(self, ones: int, size: int) -> Result:
+        """
+        Compute the Result of the test given the number of ones in the XOR of the sequence and the shifted sequence.
+        :param ones: the number of ones in the first n - d bits of the XOR sequence
+        :param size: the number of bits n in the sequence
+        :return: a Result object stating the outcome of the test
+        """
+        tmp: float = 2 * (ones - (size - self._shift) / 2.0)  / math.sqrt(size - self._shift)
         # Compute score
         score: float = math.erfc(abs(tmp) / (math.sqrt(2.0)))
 	    # Compute q_value
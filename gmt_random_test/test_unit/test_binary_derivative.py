@@ -16,6 +16,8 @@ import math
 
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
+from gmt_random_test.packed import PackedSequence, count_derivative_ones
 
 
 class BinaryDerivativeTest(Test):
@@ -28,6 +30,9 @@ class BinaryDerivativeTest(Test):
     no matter how many derivations are performed, the number of 0 and 1 should be close to the same.
     The significance value of the test is 0.01.
     """
+
+    BIT_COST: float = 2.0
+
     def __init__(self, seq_length: int, derivative: int = 1):
         # Generate base Test class
         self._derivative = derivative
@@ -38,20 +43,53 @@ class BinaryDerivativeTest(Test):
         """
         Overridden method of Test class: check its docstring for further information.
         """
-        v0: numpy.ndarray = bits.copy()
-        for i in range(self._derivative):
-            original_vector : numpy.ndarray = v0[:bits.size - 1]
-            shifted_vector: numpy.ndarray = numpy.roll(v0, -1)[:bits.size - 1]
-            v0 = numpy.bitwise_xor(original_vector, shifted_vector)
-        # Compute ones int result vector
-        v0 = v0[:bits.size - self._derivative]
-        ones: int = numpy.count_nonzero(v0)
-        zeroes: int = v0.size - ones
+        # Build the derivatives in place on the packed words
+        return self._execute_packed(PackedSequence.from_bits(bits))
+
+    def _execute_packed(self,
+                        packed: PackedSequence):
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        # Compute ones in the first n - d bits of the derivative
+        ones: int = int(count_derivative_ones(packed.words[numpy.newaxis], packed.size, [self._derivative])[0, 0])
+        return self._compute_result(ones, packed.size - self._derivative)
+
+    def prepare_batch(self,
+                      context: SequenceContext):
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        context.request_derivative_order(self._derivative)
+
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        import scipy.special
+        size: int = context.size - self._derivative
+        # Count the ones of the derivative of every row, built in the same chain as the other orders
+        ones: numpy.ndarray = context.derivative_ones(self._derivative)
+        difference: numpy.ndarray = 2 * ones - size
+        # Compute scores and q_values of all the rows at once
+        scores: numpy.ndarray = scipy.special.erfc(numpy.abs(difference) / (math.sqrt(float(size)) * math.sqrt(2.0)))
+        q_values: numpy.ndarray = scipy.special.erfc(difference / (math.sqrt(float(size)) * math.sqrt(2.0))) / 2.0
+        return scores, q_values
+
+    def _compute_result(self, ones: int, size: int) -> Result:
+        """
+        Compute the Result of the test given the number of ones in the derivative sequence.
+        :param ones: the number of ones in the derivative sequence
+        :param size: the number of bits in the derivative sequence
+        :return: a Result object stating the outcome of the test
+        """
+        zeroes: int = size - ones
         difference: int = (ones - zeroes)
         # Compute score
-        score: float = math.erfc(float(abs(difference)) / (math.sqrt(float(v0.size)) * math.sqrt(2.0)))
+        score: float = math.erfc(float(abs(difference)) / (math.sqrt(float(size)) * math.sqrt(2.0)))
 	# Compute q_value
-        q_value: float = math.erfc(float(difference) / (math.sqrt(float(v0.size)) * math.sqrt(2.0))) / 2.0
+        q_value: float = math.erfc(float(difference) / (math.sqrt(float(size)) * math.sqrt(2.0))) / 2.0
         # Return result
         if score >= self.significance_value:
             return Result(self.name, True, numpy.array([score]), numpy.array([q_value]))
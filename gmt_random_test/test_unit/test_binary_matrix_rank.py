@@ -13,16 +13,18 @@
 
 import numpy
 import math
-import copy
 
 # Import required src
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
 
 
 class BinaryMatrix:
     """
     Binary Matrix containing all the algorithm specified in the NIST suite for computing the **binary rank** of a matrix.
+    Each row of the matrix is packed in an unsigned integer word (the first column is the most significant bit in use),
+    so the elementary row operations are XORs of words. The same elimination runs on many matrices at once.
     """
 
     def __init__(self, block: numpy.ndarray, rows_number: int, columns_number: int):
@@ -31,114 +33,79 @@ class BinaryMatrix:
         self._matrix = block
         self._base_rank = min(self._rows, self._columns)
 
-    def _perform_row_operations(self, i: int, forward_elimination: bool):
-        """
-        Performs elementary row operations. This involves xor'ing up to two rows together depending on whether or not
-        certain elements in the matrix contain 1 if the "current" element does not.
-        :param i: the index of the "current" element of the matrix
-        :param forward_elimination: boolean flag if we are performing forward elimination or not
-        """
-        if forward_elimination:
-            # Process all the following rows
-            j: int = i + 1
-            while j < self._rows:
-                if self._matrix[j][i] == 1:
-                    self._matrix[j, :] = (self._matrix[j, :] + self._matrix[i, :]) % 2
-                j += 1
-        else:
-            # Process all the previous rows
-            j: int = i - 1
-            while j >= 0:
-                if self._matrix[j][i] == 1:
-                    self._matrix[j, :] = (self._matrix[j, :] + self._matrix[i, :]) % 2
-                j -= 1
-
-    def _find_unit_element_swap(self, i: int, forward_elimination: bool) -> int:
-        """
-        Searches through the rows below/above the given index to see which rows contain 1, if they do then they are
-        swapped. This is supposed to be called on the forward and backward elimination.
-        :param i: the index of the "current" element of the matrix
-        :param forward_elimination: boolean flag if we are performing forward elimination or not
-        :return: an integer value 0 or 1 depending on row_swap_operation result
-        """
-        row_swap_operation: int = 0
-        if forward_elimination:
-            # Process the following rows
-            index: int = i + 1
-            while index < self._rows and self._matrix[index][i] == 0:
-                index += 1
-            if index < self._rows:
-                row_swap_operation = self._swap_rows(i, index)
-        else:
-            # Process the previous rows
-            index: int = i - 1
-            while index >= 0 and self._matrix[index][i] == 0:
-                index -= 1
-            if index >= 0:
-                row_swap_operation = self._swap_rows(i, index)
-        return row_swap_operation
-
-    def _swap_rows(self, source_row_index: int, target_row_index: int) -> int:
-        """
-        This method just swaps two rows in a matrix. We use copy package to ensure no memory leakage.
-        :param source_row_index: the row we want to swap (source)
-        :param target_row_index: the row we want to swap it with (target)
-        :return: an integer value of 1
-        """
-        # Swap rows
-        temp_matrix = copy.copy(self._matrix[source_row_index, :])
-        self._matrix[source_row_index, :] = self._matrix[target_row_index, :]
-        self._matrix[target_row_index, :] = temp_matrix
-        # Always return 1
-        return 1
-
-    def _compute_rank(self) -> int:
-        """
-        Computes the rank of the transformed matrix. It must be called after the matrix is correctly prepared.
-        :return: the rank of the transformed matrix
-        """
-        # Rank start from the minimum value of rows and columns
-        rank: int = self._base_rank
-        i: int = 0
-        # Process all the rows
-        while i < self._rows:
-            all_zeros: bool = True
-            # Process all the columns (check if there is at least a non-zero element)
-            for j in range(self._columns):
-                if self._matrix[i][j] == 1:
-                    all_zeros = False
-            # If a row is of all zeros, it's not counted towards the rank
-            if all_zeros:
-                rank -= 1
-            i += 1
-        return rank
-
     def compute_rank(self) -> int:
         """
         Computes the **binary rank** of the matrix.
         :return: an integer defining binary rank of the matrix.
         """
+        return int(self.compute_ranks(self._matrix.reshape(1, self._rows, self._columns))[0])
+
+    @staticmethod
+    def compute_ranks(blocks: numpy.ndarray) -> numpy.ndarray:
+        """
+        Computes the **binary rank** of many matrices at once, following the NIST elimination: forward elimination
+        with the pivot of column i taken on row i (or swapped in from the first row below), then backward elimination
+        with the pivot swapped in from the nearest row above, then the rank is the base rank minus the zero rows.
+        :param blocks: the matrices of bits, wrapped in a 3D numpy array (ndarray) of shape (matrices, rows, columns)
+        :return: the rank of every matrix, in a numpy array (ndarray)
+        """
+        matrices_number, rows_number, columns_number = blocks.shape
+        base_rank: int = min(rows_number, columns_number)
+        rows, columns_bits = BinaryMatrix._pack_rows(blocks)
+        indexes: numpy.ndarray = numpy.arange(matrices_number)
         # Perform row operations with forward elimination
-        i: int = 0
-        while i < self._base_rank - 1:
-            if self._matrix[i][i] == 1:
-                self._perform_row_operations(i, True)
-            else:
-                found = self._find_unit_element_swap(i, True)
-                if found == 1:
-                    self._perform_row_operations(i, True)
-            i += 1
-        # Perform row operations without forward elimination
-        i = self._base_rank - 1
-        while i > 0:
-            if self._matrix[i][i] == 1:
-                self._perform_row_operations(i, False)
-            else:
-                if self._find_unit_element_swap(i, False) == 1:
-                    self._perform_row_operations(i, False)
-            i -= 1
-        # Compute the rank of the transformed matrix
-        return self._compute_rank()
+        for i in range(base_rank - 1):
+            column_bit = rows.dtype.type(1 << (columns_bits - 1 - i))
+            # Pivot on the first row from i with a one in column i (row i itself if it has one)
+            candidates: numpy.ndarray = (rows[:, i:] & column_bit) != 0
+            pivots: numpy.ndarray = i + numpy.argmax(candidates, axis=1)
+            BinaryMatrix._swap_rows(rows, indexes, i, pivots)
+            # Xor the pivot row into the following rows with a one in column i
+            following: numpy.ndarray = (rows[:, i + 1:] & column_bit) != 0
+            rows[:, i + 1:] ^= numpy.where(following, rows[:, i:i + 1], rows.dtype.type(0))
+        # Perform row operations with backward elimination
+        for i in range(base_rank - 1, 0, -1):
+            column_bit = rows.dtype.type(1 << (columns_bits - 1 - i))
+            # Pivot on row i if it has a one in column i, or on the nearest previous row with one
+            candidates: numpy.ndarray = (rows[:, i::-1] & column_bit) != 0
+            pivots: numpy.ndarray = i - numpy.argmax(candidates, axis=1)
+            BinaryMatrix._swap_rows(rows, indexes, i, pivots)
+            # Xor the pivot row into the previous rows with a one in column i
+            previous: numpy.ndarray = (rows[:, :i] & column_bit) != 0
+            rows[:, :i] ^= numpy.where(previous, rows[:, i:i + 1], rows.dtype.type(0))
+        # Rank start from the minimum value of rows and columns, the rows of all zeros are not counted towards the rank
+        return base_rank - numpy.count_nonzero(rows == 0, axis=1)
+
+    @staticmethod
+    def _pack_rows(blocks: numpy.ndarray) -> tuple:
+        """
+        Pack every row of the matrices in the smallest unsigned integer word that can hold it.
+        :param blocks: the matrices of bits, wrapped in a 3D numpy array (ndarray) of shape (matrices, rows, columns)
+        :return: the rows as words in a 2D numpy array (ndarray) of shape (matrices, rows) and the number of bits
+                 used in a word (column j is the bit at position bits - 1 - j)
+        """
+        matrices_number, rows_number, columns_number = blocks.shape
+        if columns_number > 64:
+            raise RuntimeError("inapplicable matrix size.")
+        packed: numpy.ndarray = numpy.packbits(blocks, axis=2)
+        word_size: int = next(size for size in (1, 2, 4, 8) if size >= packed.shape[2])
+        padded: numpy.ndarray = numpy.zeros((matrices_number, rows_number, word_size), dtype=numpy.uint8)
+        padded[:, :, word_size - packed.shape[2]:] = packed
+        rows: numpy.ndarray = padded.view(f'>u{word_size}')[:, :, 0].astype(f'u{word_size}')
+        return rows, packed.shape[2] * 8
+
+    @staticmethod
+    def _swap_rows(rows: numpy.ndarray, indexes: numpy.ndarray, source_row_index: int, target_rows_indexes: numpy.ndarray):
+        """
+        Swaps, in every matrix, the given row with the target row of that matrix.
+        :param rows: the rows of the matrices, wrapped in a 2D numpy array (ndarray)
+        :param indexes: the indexes of the matrices
+        :param source_row_index: the row we want to swap (source)
+        :param target_rows_indexes: the row of every matrix we want to swap it with (target)
+        """
+        temp_rows: numpy.ndarray = rows[:, source_row_index].copy()
+        rows[:, source_row_index] = rows[indexes, target_rows_indexes]
+        rows[indexes, target_rows_indexes] = temp_rows
 
 
 class BinaryMatrixRankTest(Test):
@@ -150,6 +117,8 @@ class BinaryMatrixRankTest(Test):
     The significance value of the test is 0.01.
     """
 
+    BIT_COST: float = 22.0
+
     def __init__(self, seq_length: int, rows_number: int = 32, cols_number: int = 32):
         # Define specific test attributes
         self._rows_number: int = rows_number
@@ -172,33 +141,49 @@ class BinaryMatrixRankTest(Test):
         """
         Overridden method of Test class: check its docstring for further information.
         """
+        # Get the bits of all the blocks and reshape them in a 3D array (the matrices)
+        blocks: numpy.ndarray = bits[:self._blocks_number * self._rows_number * self._cols_number].reshape((self._blocks_number, self._rows_number, self._cols_number))
+        # Compute rank of all the block matrices
+        ranks: numpy.ndarray = BinaryMatrix.compute_ranks(blocks)
         # Compute the number of full rank, minus rank and remained rank matrices
-        full_rank_matrices: int = 0
-        minus_rank_matrices: int = 0
-        remainder: int = 0
-        for i in range(self._blocks_number):
-            # Get the bits in the block and reshape them in a 2D array (the matrix)
-            block: numpy.ndarray = bits[i * (self._rows_number * self._cols_number):(i + 1) * (self._rows_number * self._cols_number)].reshape((self._rows_number, self._cols_number))
-            # Compute rank of the block matrix
-            matrix: BinaryMatrix = BinaryMatrix(block, self._rows_number, self._cols_number)
-            rank: int = matrix.compute_rank()
-            # Count the result
-            if rank == self._rows_number:
-                full_rank_matrices += 1
-            elif rank == self._rows_number - 1:
-                minus_rank_matrices += 1
-            else:
-                remainder += 1
-        # Compute Chi-square
-        chi_square: float = (((full_rank_matrices - (self._full_rank_probability * self._blocks_number)) ** 2) / (self._full_rank_probability * self._blocks_number)) + (((minus_rank_matrices - (self._minus_rank_probability * self._blocks_number)) ** 2) / (self._minus_rank_probability * self._blocks_number)) + (((remainder - (self._remained_rank_probability * self._blocks_number)) ** 2) / (self._remained_rank_probability * self._blocks_number))
+        full_rank_matrices: int = int(numpy.count_nonzero(ranks == self._rows_number))
+        minus_rank_matrices: int = int(numpy.count_nonzero(ranks == self._rows_number - 1))
         # Compute the score (P-value)
-        score: float = math.e ** (-chi_square / 2.0)
+        score: float = float(self._compute_score(full_rank_matrices, minus_rank_matrices))
         q_value: float = score
         # Return result
         if score >= self.significance_value:
             return Result(self.name, True, numpy.array([score]), numpy.array([q_value]))
         return Result(self.name, False, numpy.array([score]), numpy.array([q_value]))
 
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        bits_matrix: numpy.ndarray = context.bits
+        # Get the block matrices of all the rows and compute all their ranks at once
+        blocks: numpy.ndarray = bits_matrix[:, :self._blocks_number * self._rows_number * self._cols_number].reshape((bits_matrix.shape[0] * self._blocks_number, self._rows_number, self._cols_number))
+        ranks: numpy.ndarray = BinaryMatrix.compute_ranks(blocks).reshape((bits_matrix.shape[0], self._blocks_number))
+        # Compute the number of full rank and minus rank matrices of every row
+        full_rank_matrices: numpy.ndarray = numpy.count_nonzero(ranks == self._rows_number, axis=1)
+        minus_rank_matrices: numpy.ndarray = numpy.count_nonzero(ranks == self._rows_number - 1, axis=1)
+        # Compute scores (P-values) of all the rows at once, q_value = p_value
+        scores: numpy.ndarray = self._compute_score(full_rank_matrices, minus_rank_matrices)
+        return scores, scores.copy()
+
+    def _compute_score(self, full_rank_matrices, minus_rank_matrices):
+        """
+        Compute the score (P-value) given the number of full rank and minus rank matrices.
+        :param full_rank_matrices: the number of full rank matrices (an integer or a numpy array of them)
+        :param minus_rank_matrices: the number of minus rank matrices (an integer or a numpy array of them)
+        :return: the score, or the numpy array of scores
+        """
+        remainder = self._blocks_number - full_rank_matrices - minus_rank_matrices
+        # Compute Chi-square
+        chi_square = (((full_rank_matrices - (self._full_rank_probability * self._blocks_number)) ** 2) / (self._full_rank_probability * self._blocks_number)) + (((minus_rank_matrices - (self._minus_rank_probability * self._blocks_number)) ** 2) / (self._minus_rank_probability * self._blocks_number)) + (((remainder - (self._remained_rank_probability * self._blocks_number)) ** 2) / (self._remained_rank_probability * self._blocks_number))
+        return math.e ** (-chi_square / 2.0)
+
     # def is_eligible(self,
     #                 bits: numpy.ndarray) -> bool:
     #     """
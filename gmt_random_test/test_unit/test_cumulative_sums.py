@@ -13,10 +13,12 @@
 
 import numpy
 import math
+import functools
 
 # Import required src
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
 
 
 class CumulativeSumsTest(Test):
@@ -31,6 +33,8 @@ class CumulativeSumsTest(Test):
     The significance value of the test is 0.01.
     """
 
+    BIT_COST: float = 14.0
+
     def __init__(self, seq_length: int):
         # Generate base Test class
         super(CumulativeSumsTest, self).__init__("Cumulative Sums", 0.01, seq_length)
@@ -40,23 +44,11 @@ class CumulativeSumsTest(Test):
         """
         Overridden method of Test class: check its docstring for further information.
         """
-        bits_copy: numpy.ndarray = numpy.zeros(bits.size,dtype=int)
-        # Convert all the zeros in the array to -1
-        for i in range(bits_copy.size):
-            bits_copy[i] = -1 if bits[i] == 0 else 1
         # Compute the partial sum with forward (mode 0) and backward (mode 1) modes and record the largest excursion
-        forward_sum: int = 0
-        backward_sum: int = 0
-        forward_max: int = 0
-        backward_max: int = 0
-        for i in range(bits_copy.size):
-            forward_sum += bits_copy[i]
-            backward_sum += bits_copy[bits_copy.size - 1 - i]
-            forward_max = max(abs(forward_sum), forward_max)
-            backward_max = max(abs(backward_sum), backward_max)
+        forward_max, backward_max = self._compute_max_excursions(bits.reshape((1, bits.size)))
         # Compute the scores (P-Values)
-        score_1: float = self._compute_p_value(bits_copy.size, forward_max)
-        score_2: float = self._compute_p_value(bits_copy.size, backward_max)
+        score_1: float = self._compute_p_value(bits.size, int(forward_max[0]))
+        score_2: float = self._compute_p_value(bits.size, int(backward_max[0]))
         q_value_1: float = score_1
         q_value_2: float = score_2
         # Return result
@@ -64,32 +56,79 @@ class CumulativeSumsTest(Test):
             return Result(self.name, True, numpy.array([score_1, score_2]), numpy.array([q_value_1, q_value_2]))
         return Result(self.name, False, numpy.array([score_1, score_2]), numpy.array([q_value_1, q_value_2]))
 
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        forward_max, backward_max = self._compute_max_excursions(context.bits)
+        # Compute the scores (P-Values), once for every distinct excursion
+        scores: numpy.ndarray = numpy.stack((self._compute_p_values(context.size, forward_max), self._compute_p_values(context.size, backward_max)), axis=1)
+        return scores, scores.copy()
+
+    @staticmethod
+    def _compute_max_excursions(bits_matrix: numpy.ndarray, chunk_size: int = 1 << 22) -> tuple:
+        """
+        Compute the largest excursions of the forward and backward random walks of the (-1, +1) digits of every row.
+        The walks are summed a range of columns at a time, carrying the partial sums over, so the temporary memory
+        does not grow with the length of the rows.
+        :param bits_matrix: the sequences of bits, wrapped in a 2D numpy array (ndarray) with a sequence per row
+        :param chunk_size: the number of bits (over all the rows) summed at a time
+        :return: the forward and the backward max excursions of every row, each in a numpy array (ndarray)
+        """
+        rows_number, row_size = bits_matrix.shape
+        # The total, the lowest and the highest of the forward partial sums S_1... S_n of every row
+        totals: numpy.ndarray = numpy.zeros(rows_number, dtype=numpy.int64)
+        lowest: numpy.ndarray = numpy.zeros(rows_number, dtype=numpy.int64)
+        highest: numpy.ndarray = numpy.zeros(rows_number, dtype=numpy.int64)
+        columns_number: int = max(1, chunk_size // max(rows_number, 1))
+        for start in range(0, row_size, columns_number):
+            walks: numpy.ndarray = numpy.cumsum(bits_matrix[:, start:start + columns_number].astype(numpy.int64) * 2 - 1, axis=1) + totals[:, numpy.newaxis]
+            lowest = numpy.minimum(lowest, walks.min(axis=1)) if start > 0 else walks.min(axis=1)
+            highest = numpy.maximum(highest, walks.max(axis=1)) if start > 0 else walks.max(axis=1)
+            totals = walks[:, -1].copy()
+        forward_max: numpy.ndarray = numpy.maximum(numpy.maximum(highest, -lowest), 0)
+        # The backward partial sums are the total minus the forward partial sums S_0 = 0... S_(n - 1), and S_n adds a
+        # zero excursion, so the extremes of S_1... S_n with 0 give the backward max excursion as well
+        backward_max: numpy.ndarray = numpy.maximum(totals - numpy.minimum(lowest, 0), numpy.maximum(highest, 0) - totals)
+        return forward_max, backward_max
+
+    @staticmethod
+    def _compute_p_values(sequence_size: int, max_excursions: numpy.ndarray) -> numpy.ndarray:
+        """
+        Compute the P-Values of many max excursions of sequences of the same size, evaluating each distinct one once.
+        :param sequence_size: the length of the sequences of bits
+        :param max_excursions: the max excursions, wrapped in a numpy array (ndarray)
+        :return: the computed P-Values in a numpy array (ndarray)
+        """
+        excursions, inverse = numpy.unique(max_excursions, return_inverse=True)
+        p_values: numpy.ndarray = numpy.array([CumulativeSumsTest._compute_p_value(sequence_size, int(excursion)) for excursion in excursions], dtype=float)
+        return p_values[inverse.reshape(-1)]
+
     def __repr__(self) -> str:
         return f'{self.name}'
 
     @staticmethod
+    @functools.lru_cache(maxsize=4096)
     def _compute_p_value(sequence_size: int, max_excursion: int) -> float:
         """
         Compute P-Value given the sequence size and the max excursion.
+        The terms of each series are evaluated at once and the result is cached, since samples of the same length
+        share few distinct excursions.
         :param sequence_size: the length of the sequence of bits
         :param max_excursion: the max excursion backward or forward
         :return: the computed float P-Value
         """
+        import scipy.special
         # Execute first sum
-        sum_a: float = 0.0
         start_k: int = int(math.floor((((float(-sequence_size) / max_excursion) + 1.0) / 4.0)))
         end_k: int = int(math.floor((((float(sequence_size) / max_excursion) - 1.0) / 4.0)))
-        for k in range(start_k, end_k + 1):
-            c: float = 0.5 * math.erfc(-(((4.0 * k) + 1.0) * max_excursion) / math.sqrt(sequence_size) * math.sqrt(0.5))
-            d: float = 0.5 * math.erfc(-(((4.0 * k) - 1.0) * max_excursion) / math.sqrt(sequence_size) * math.sqrt(0.5))
-            sum_a = sum_a + c - d
+        k: numpy.ndarray = numpy.arange(start_k, end_k + 1, dtype=float)
+        sum_a: float = float(numpy.sum(0.5 * scipy.special.erfc(-(((4.0 * k) + 1.0) * max_excursion) / math.sqrt(sequence_size) * math.sqrt(0.5)) - 0.5 * scipy.special.erfc(-(((4.0 * k) - 1.0) * max_excursion) / math.sqrt(sequence_size) * math.sqrt(0.5))))
         # Execute second sum
-        sum_b: float = 0.0
         start_k = int(math.floor((((float(-sequence_size) / max_excursion) - 3.0) / 4.0)))
         end_k = int(math.floor((((float(sequence_size) / max_excursion) - 1.0) / 4.0)))
-        for k in range(start_k, end_k + 1):
-            c: float = 0.5 * math.erfc(-(((4.0 * k) + 3.0) * max_excursion) / math.sqrt(sequence_size) * math.sqrt(0.5))
-            d: float = 0.5 * math.erfc(-(((4.0 * k) + 1.0) * max_excursion) / math.sqrt(sequence_size) * math.sqrt(0.5))
-            sum_b = sum_b + c - d
+        k = numpy.arange(start_k, end_k + 1, dtype=float)
+        sum_b: float = float(numpy.sum(0.5 * scipy.special.erfc(-(((4.0 * k) + 3.0) * max_excursion) / math.sqrt(sequence_size) * math.sqrt(0.5)) - 0.5 * scipy.special.erfc(-(((4.0 * k) + 1.0) * max_excursion) / math.sqrt(sequence_size) * math.sqrt(0.5))))
         # Return value
-        return 1.0 - sum_a + sum_b
\ No newline at end of file
+        return 1.0 - sum_a + sum_b
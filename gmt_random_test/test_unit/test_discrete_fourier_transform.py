@@ -13,12 +13,12 @@
 
 import numpy
 import math
-import sys
 
 
 # Import required src
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
 
 
 class DiscreteFourierTransformTest(Test):
@@ -33,7 +33,26 @@ class DiscreteFourierTransformTest(Test):
     The significance value of the test is 0.01.
     """
 
-    def __init__(self, seq_length: int):
+    BIT_COST: float = 30.0
+
+    def __init__(self, seq_length: int, single_precision: bool = False, workers: int = None, memory_budget: int = 1 << 28):
+        """
+        :param seq_length: the length of the sequences to test
+        :param single_precision: compute the transform in float32 instead of float64
+        :param workers: the number of threads scipy.fft may use for a transform (default: 1)
+        :param memory_budget: the bytes of intermediate spectrum kept at a time when a long sequence is transformed in
+                              four steps (see _count_peaks_four_step)
+
+        Tolerance: the magnitudes of the real-input FFT differ from those of a full complex FFT by about 1e-15 relative
+        to the threshold in float64, so the count of peaks is the same unless a magnitude is that close to the threshold.
+        In float32 the difference is about 4e-7: on 1e6 bits fewer than 0.1 magnitudes are expected to cross the
+        threshold, and every peak counted differently moves the normalized difference by 1 / sqrt(n * 0.0125).
+        """
+        self._dtype: type = numpy.float32 if single_precision else numpy.float64
+        self._workers: int = workers
+        self._memory_budget: int = memory_budget
+        # Sequences longer than 2^22 bits whose length has a factor large enough are transformed in four steps
+        self._rows_number: int = self._four_step_rows(seq_length) if seq_length > 1 << 22 else None
         # Generate base Test class
         super(DiscreteFourierTransformTest, self).__init__("Discrete Fourier Transform", 0.01, seq_length)
 
@@ -42,23 +61,15 @@ class DiscreteFourierTransformTest(Test):
         """
         Overridden method of Test class: check its docstring for further information.
         """
-        bits_copy: numpy.ndarray = numpy.zeros(bits.size, dtype=int)
-        # Convert all the zeros in the array to -1
-        for i in range(bits_copy.size):
-            bits_copy[i] = -1 if bits[i] == 0 else 1
-        # Compute DFT
-        discrete_fourier_transform = numpy.fft.fft(bits_copy)
-        # Compute magnitudes of first half of sequence
-        magnitudes = numpy.abs(discrete_fourier_transform)[:bits_copy.size // 2]
-        # Compute upper threshold
-        # threshold: float = math.sqrt(math.log(1.0 / 0.05) * bits_copy.size)
-        threshold: float = math.sqrt(2.995732274 * bits_copy.size)
+        # Count the peaks under the upper threshold (N1)
+        if self._rows_number is not None and bits.size == self.seq_length:
+            counted_peaks: float = float(self._count_peaks_four_step(bits))
+        else:
+            counted_peaks: float = float(self._count_peaks(bits.reshape((1, bits.size)).astype(self._dtype) * 2 - 1)[0])
         # Compute the expected number of peaks (N0)
-        expected_peaks: float = 0.95 * bits_copy.size / 2.0
-        # Count the peaks above the upper threshold (N1)
-        counted_peaks: float = float(len(magnitudes[magnitudes < threshold]))
+        expected_peaks: float = 0.95 * bits.size / 2.0
         # Compute the score (P-value) using the normalized difference (using different parameters from NIST)
-        normalized_difference: float = (counted_peaks - expected_peaks) / math.sqrt((bits_copy.size / 3.8 )* 0.95 * 0.05 )
+        normalized_difference: float = (counted_peaks - expected_peaks) / math.sqrt((bits.size / 3.8 )* 0.95 * 0.05 )
         score: float = math.erfc(abs(normalized_difference) / math.sqrt(2))
         q_value: float = math.erfc(normalized_difference / math.sqrt(2)) / 2.0
         # Return result
@@ -66,6 +77,106 @@ class DiscreteFourierTransformTest(Test):
             return Result(self.name, True, numpy.array([score]), numpy.array([q_value]))
         return Result(self.name, False, numpy.array([score]), numpy.array([q_value]))
 
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        import scipy.special
+        size: int = context.size
+        # Count the peaks of all the rows with a single transform, or of one long row at a time
+        if self._rows_number is not None and size == self.seq_length:
+            counted_peaks: numpy.ndarray = numpy.array([self._count_peaks_four_step(bits) for bits in context.bits], dtype=float)
+        else:
+            counted_peaks: numpy.ndarray = self._count_peaks(context.signs(self._dtype)).astype(float)
+        expected_peaks: float = 0.95 * size / 2.0
+        # Compute scores and q_values of all the rows at once
+        normalized_difference: numpy.ndarray = (counted_peaks - expected_peaks) / math.sqrt((size / 3.8 )* 0.95 * 0.05 )
+        scores: numpy.ndarray = scipy.special.erfc(numpy.abs(normalized_difference) / math.sqrt(2))
+        q_values: numpy.ndarray = scipy.special.erfc(normalized_difference / math.sqrt(2)) / 2.0
+        return scores, q_values
+
+    def _count_peaks(self,
+                     signs: numpy.ndarray) -> numpy.ndarray:
+        """
+        Count, for every row, the magnitudes of the first half of the DFT of the (-1, +1) digits under the threshold.
+        :param signs: the (-1, +1) digits of the sequences, wrapped in a 2D numpy array (ndarray) with a sequence per row
+        :return: the number of peaks under the threshold of every row, in a numpy array (ndarray)
+        """
+        import scipy.fft
+        size: int = signs.shape[1]
+        # Compute DFT of the real input, only the first half of the spectrum is needed
+        discrete_fourier_transform: numpy.ndarray = scipy.fft.rfft(signs, axis=1, workers=self._workers)
+        # Compute magnitudes of first half of sequence
+        magnitudes: numpy.ndarray = numpy.abs(discrete_fourier_transform[:, :size // 2])
+        # Compute upper threshold
+        # threshold: float = math.sqrt(math.log(1.0 / 0.05) * size)
+        threshold: float = math.sqrt(2.995732274 * size)
+        return numpy.count_nonzero(magnitudes < threshold, axis=1)
+
+    @staticmethod
+    def _four_step_rows(size: int) -> int:
+        """
+        Find the factorization n = n1 * n2 of the length of the sequences used by the four-step transform.
+        :param size: the length n of the sequences
+        :return: the largest divisor n1 of n not greater than sqrt(n), or None if it is too small to be worth it
+        """
+        for rows_number in range(math.isqrt(size), 1023, -1):
+            if size % rows_number == 0:
+                return rows_number
+        return None
+
+    def _count_peaks_four_step(self,
+                               bits: numpy.ndarray) -> int:
+        """
+        Count the magnitudes of the first half of the DFT of the (-1, +1) digits of a long sequence under the
+        threshold, with the four-step algorithm: the sequence is seen as a matrix of n1 rows and n2 columns, the
+        columns are transformed (keeping half of the frequencies k1, the input being real), multiplied by the twiddle
+        factors and the rows transformed, giving the frequency k1 + n1 * k2. The frequencies above n / 2 give those
+        under it by conjugate symmetry. Only a range of k1 is kept at a time, so the memory used is bounded by the
+        memory budget instead of growing with the length of the sequence.
+        :param bits: the sequence of bits, wrapped in a numpy array (ndarray)
+        :return: the number of peaks under the threshold
+        """
+        import scipy.fft
+        size: int = bits.size
+        rows_number: int = self._rows_number
+        columns_number: int = size // rows_number
+        complex_dtype: type = numpy.result_type(self._dtype, numpy.complex64)
+        itemsize: int = numpy.dtype(complex_dtype).itemsize
+        matrix: numpy.ndarray = bits.reshape((rows_number, columns_number))
+        half_size: int = size // 2
+        threshold: float = math.sqrt(2.995732274 * size)
+        frequencies_number: int = rows_number // 2 + 1
+        # Number of frequencies k1 kept in a pass, and of columns and rows transformed at a time
+        pass_frequencies: int = max(1, min(frequencies_number, self._memory_budget // (columns_number * itemsize)))
+        chunk_columns: int = max(1, (self._memory_budget // 8) // (rows_number * itemsize))
+        chunk_rows: int = max(1, (self._memory_budget // 8) // (columns_number * itemsize))
+        columns: numpy.ndarray = numpy.arange(columns_number, dtype=numpy.int64)
+        frequencies_k2: numpy.ndarray = numpy.arange(columns_number, dtype=numpy.int64) * rows_number
+        counted_peaks: int = 0
+        for first_frequency in range(0, frequencies_number, pass_frequencies):
+            last_frequency: int = min(first_frequency + pass_frequencies, frequencies_number)
+            # Transform the columns, keeping the frequencies k1 of the pass
+            spectrum: numpy.ndarray = numpy.empty((last_frequency - first_frequency, columns_number), dtype=complex_dtype)
+            for start in range(0, columns_number, chunk_columns):
+                end: int = min(start + chunk_columns, columns_number)
+                signs: numpy.ndarray = matrix[:, start:end].astype(self._dtype) * 2 - 1
+                spectrum[:, start:end] = scipy.fft.rfft(signs, axis=0, workers=self._workers)[first_frequency:last_frequency]
+            # Apply the twiddle factors, transform the rows and count the peaks of every frequency k1 + n1 * k2
+            for start in range(first_frequency, last_frequency, chunk_rows):
+                end: int = min(start + chunk_rows, last_frequency)
+                frequencies_k1: numpy.ndarray = numpy.arange(start, end, dtype=numpy.int64)[:, numpy.newaxis]
+                twiddles: numpy.ndarray = numpy.exp(((frequencies_k1 * columns) % size) * (-2j * math.pi / size)).astype(complex_dtype)
+                rows: numpy.ndarray = spectrum[start - first_frequency:end - first_frequency] * twiddles
+                under_threshold: numpy.ndarray = numpy.abs(scipy.fft.fft(rows, axis=1, overwrite_x=True, workers=self._workers)) < threshold
+                frequencies: numpy.ndarray = frequencies_k1 + frequencies_k2
+                counted_peaks += int(numpy.count_nonzero(under_threshold & (frequencies < half_size)))
+                # The frequencies k1 in (n1 / 2, n1) are not computed: count them through their conjugates n - k
+                mirrored: numpy.ndarray = (frequencies_k1 > 0) & (2 * frequencies_k1 < rows_number)
+                counted_peaks += int(numpy.count_nonzero(under_threshold & mirrored & (frequencies > size - half_size)))
+        return counted_peaks
+
     def __repr__(self) -> str:
         return f'{self.name}'
 
@@ -12,11 +12,12 @@
 # Import packages
 
 import numpy
-import scipy.special
 
 # Import required src
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
+from gmt_random_test.packed import PackedSequence, count_block_ones
 
 
 class FrequencyWithinBlockTest(Test):
@@ -48,6 +49,45 @@ class FrequencyWithinBlockTest(Test):
             block: numpy.ndarray = bits[i * self._block_size:((i + 1) * self._block_size)]
             # Compute ones and save the fraction in the array
             block_fractions[i] = numpy.count_nonzero(block) / self._block_size
+        return self._compute_result(block_fractions)
+
+    def _execute_packed(self,
+                        packed: PackedSequence) -> Result:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        # Compute ones of every block with a popcount of the packed bytes
+        block_fractions: numpy.ndarray = count_block_ones(packed, self._block_size, self._blocks_number) / self._block_size
+        return self._compute_result(block_fractions)
+
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        import scipy.special
+        bits_matrix: numpy.ndarray = context.bits
+        # Compute the fractions of ones of the blocks of all the rows
+        if self._block_size % 8 == 0:
+            # The blocks are whole bytes, add up their popcounts
+            blocks: numpy.ndarray = context.popcounts()[:, :self._blocks_number * self._block_size // 8].reshape(len(context), self._blocks_number, self._block_size // 8)
+            block_fractions: numpy.ndarray = numpy.sum(blocks, axis=2, dtype=numpy.int64) / self._block_size
+        else:
+            blocks: numpy.ndarray = bits_matrix[:, :self._blocks_number * self._block_size].reshape(bits_matrix.shape[0], self._blocks_number, self._block_size)
+            block_fractions: numpy.ndarray = numpy.count_nonzero(blocks, axis=2) / self._block_size
+        # Compute Chi-square of every row
+        chi_square: numpy.ndarray = numpy.sum(4.0 * self._block_size * ((block_fractions - 0.5) ** 2), axis=1)
+        # Compute scores (P-values) of all the rows at once, q_value = p_value
+        scores: numpy.ndarray = scipy.special.gammaincc((self._blocks_number / 2.0), chi_square / 2.0)
+        return scores, scores.copy()
+
+    def _compute_result(self, block_fractions: numpy.ndarray) -> Result:
+        """
+        Compute the Result of the test given the fractions of ones in the blocks.
+        :param block_fractions: the fraction of ones of every block, wrapped in a numpy array (ndarray)
+        :return: a Result object stating the outcome of the test
+        """
+        import scipy.special
         # Compute Chi-square
         chi_square: float = numpy.sum(4.0 * self._block_size * ((block_fractions[:] - 0.5) ** 2))
         # Compute score (P-value) applying the lower incomplete gamma function
@@ -13,7 +13,6 @@
 # Import packages
 
 import numpy
-import scipy.special
 
 # Import required src
 
@@ -29,27 +28,35 @@ class LinearComplexityTest(Test):
     The significance value of the test is 0.01.
     """
 
+    BIT_COST: float = 0.7
+
     def __init__(self, seq_length: int, pattern_length = 1000):
         # Define specific test attributes
         self._pattern_length: int = pattern_length
         self._freedom_degrees: int = 6
         self._probabilities: numpy.ndarray = numpy.array([0.010417, 0.03125, 0.125, 0.5, 0.25, 0.0625, 0.020833])
         # Compute mean
-        self._mu: float = (self._pattern_length / 2.0) + (((-1) ** (self._pattern_length + 1)) + 9.0) / 36.0 - ((self._pattern_length / 3.0) + (2.0 / 9.0)) / (2 ** self._pattern_length)
+        self._mu: float = (self._pattern_length / 2.0) + (((-1) ** (self._pattern_length + 1)) + 9.0) / 36.0 - ((self._pattern_length / 3.0) + (2.0 / 9.0)) * (2.0 ** -self._pattern_length)
         # Define attributes
         self._blocks_number: int = seq_length // pattern_length
         # Generate base Test class
         super(LinearComplexityTest, self).__init__("Linear Complexity", 0.01, seq_length)
 
+    def estimated_cost(self) -> float:
+        """
+        Overridden method of Test class: the Berlekamp-Massey algorithm costs each bit of a block the length of the block.
+        """
+        return self.BIT_COST * self.seq_length * self._pattern_length
+
     def _execute(self,
                  bits: numpy.ndarray) -> Result:
         """
         Overridden method of Test class: check its docstring for further information.
         """
+        import scipy.special
         # Compute the linear complexity of the blocks
-        blocks_linear_complexity: numpy.ndarray = numpy.zeros(self._blocks_number, dtype=int)
-        for i in range(self._blocks_number):
-            blocks_linear_complexity[i] = self.berlekamp_massey_algorithm(bits[(i * self._pattern_length) : ((i + 1) * self._pattern_length)])
+        blocks: numpy.ndarray = bits[:self._blocks_number * self._pattern_length].reshape(self._blocks_number, self._pattern_length)
+        blocks_linear_complexity: numpy.ndarray = self.berlekamp_massey_batch(blocks)
         # Count the distribution over tickets
         tickets: numpy.ndarray =  ((-1) ** self._pattern_length) * (blocks_linear_complexity[:] - self._mu) + (2.0 / 9.0)
         # Compute frequencies depending on tickets
@@ -75,34 +82,89 @@ class LinearComplexityTest(Test):
            for a given binary output sequence. The algorithm will also find the minimal polynomial of a linearly recurrent
            sequence in an arbitrary field. The field requirement means that the Berlekamp-Massey algorithm requires all
            non-zero elements to have a multiplicative inverse.
+           The polynomials over GF(2) are stored as Python integers (bit j is the coefficient of x^j), so the discrepancy
+           is the parity of an AND and the corrections are XORs of shifted integers.
+           As in the original implementation, only the first l coefficients of b are used in the correction.
            :param block_data:
            :return:
            """
            n = len(block_data)
-           c = numpy.zeros(n)
-           b = numpy.zeros(n)
-           c[0], b[0] = 1, 1
-           l, m, i = 0, -1, 0
-           int_data = [int(el) for el in block_data]
-           while i < n:
-               v = int_data[(i - l):i]
-               v = v[::-1]
-               cc = c[1:l + 1]
-               d = (int_data[i] + numpy.dot(v, cc)) % 2
+           c, b = 1, 1
+           l, m = 0, -1
+           # Bit j of the window is the bit i - j of the block
+           window = 0
+           for i in range(n):
+               window = (window << 1) | int(block_data[i])
+               d = bin(c & window & ((2 << l) - 1)).count("1") & 1
                if d == 1:
-                   temp = numpy.copy(c)
-                   p = numpy.zeros(n)
-                   for j in range(0, l):
-                       if b[j] == 1:
-                           p[j + i - m] = 1
-                   c = (c + p) % 2
-                   if l <= 0.5 * i:
+                   temp = c
+                   c ^= (b & ((1 << l) - 1)) << (i - m)
+                   if 2 * l <= i:
                        l = i + 1 - l
                        m = i
                        b = temp
-               i += 1
            return l
 
+    @staticmethod
+    def berlekamp_massey_batch(blocks: numpy.ndarray) -> numpy.ndarray:
+           """
+           Run the Berlekamp Massey Algorithm (see berlekamp_massey_algorithm) on all the blocks at once.
+           The polynomials of every block are packed in uint64 words (bit j of the polynomial is bit j % 64 of word j // 64)
+           and each step of the algorithm is a few vectorized XOR, AND and shift operations across all the blocks.
+           The correction polynomial is kept already multiplied by x^(i - m), so it only ever moves by one bit per step.
+           :param blocks: the blocks of bits, one per row, wrapped in a 2D numpy array (ndarray)
+           :return: the linear complexity of every block, in a numpy array (ndarray)
+           """
+           blocks_number, n = blocks.shape
+           words_number = n // 64 + 1
+           # masks[k] keeps the bits below k
+           max_mask = words_number * 64
+           kept_bits = numpy.arange(max_mask + 1)[:, numpy.newaxis] - 64 * numpy.arange(words_number)[numpy.newaxis, :]
+           partial_masks = (numpy.uint64(1) << numpy.clip(kept_bits, 0, 63).astype(numpy.uint64)) - numpy.uint64(1)
+           masks = numpy.where(kept_bits >= 64, numpy.uint64(0xFFFFFFFFFFFFFFFF), numpy.where(kept_bits > 0, partial_masks, numpy.uint64(0)))
+           c = numpy.zeros((blocks_number, words_number), dtype=numpy.uint64)
+           shifted_b = numpy.zeros((blocks_number, words_number), dtype=numpy.uint64)
+           window = numpy.zeros((blocks_number, words_number), dtype=numpy.uint64)
+           c[:, 0] = 1
+           # b = 1 multiplied by x^(i - m) with i = 0 and m = -1
+           shifted_b[:, 0] = 2
+           l = numpy.zeros(blocks_number, dtype=numpy.int64)
+           m = numpy.full(blocks_number, -1, dtype=numpy.int64)
+           for i in range(n):
+               LinearComplexityTest._shift_words_up(window)
+               window[:, 0] |= blocks[:, i].astype(numpy.uint64)
+               # Discrepancy: parity of the coefficients 0..l of c times the bits i..i-l of the block
+               d = LinearComplexityTest._parity(numpy.bitwise_xor.reduce(c & window & masks[numpy.minimum(l + 1, max_mask)], axis=1)).astype(bool)
+               if numpy.any(d):
+                   temp = c[d]
+                   # Only the first l coefficients of b are used (they sit from i - m in the shifted polynomial)
+                   c[d] ^= shifted_b[d] & masks[numpy.minimum(l[d] + i - m[d], max_mask)]
+                   change = numpy.zeros(blocks_number, dtype=bool)
+                   change[d] = 2 * l[d] <= i
+                   shifted_b[change] = temp[change[d]]
+                   l[change] = i + 1 - l[change]
+                   m[change] = i
+               LinearComplexityTest._shift_words_up(shifted_b)
+           return l
+
+    @staticmethod
+    def _shift_words_up(words: numpy.ndarray):
+           """
+           Multiply in place by x the polynomials packed in the rows of uint64 words (bits move towards higher powers).
+           """
+           carry = words[:, :-1] >> numpy.uint64(63)
+           words <<= numpy.uint64(1)
+           words[:, 1:] |= carry
+
+    @staticmethod
+    def _parity(words: numpy.ndarray) -> numpy.ndarray:
+           """
+           Compute the parity of the number of ones of every uint64 word.
+           """
+           for shift in (32, 16, 8, 4, 2, 1):
+               words = words ^ (words >> numpy.uint64(shift))
+           return words & numpy.uint64(1)
+
 
     def __repr__(self) -> str:
         return f'{self.name} (m={self._pattern_length})'
\ No newline at end of file
@@ -12,11 +12,12 @@
 # Import packages
 
 import numpy
-import scipy.special
 
 # Import required src
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
+from gmt_random_test.functions import longest_runs_in_blocks
 
 
 class LongestRunsInABlockTest(Test):
@@ -30,6 +31,8 @@ class LongestRunsInABlockTest(Test):
     The significance value of the test is 0.01.
     """
 
+    BIT_COST: float = 20.0
+
     def __init__(self, seq_length: int):
         # Define attributes
         block_size: int = 10000
@@ -49,62 +52,15 @@ class LongestRunsInABlockTest(Test):
         # Generate base Test class
         super(LongestRunsInABlockTest, self).__init__("Longest Runs In A Block", 0.01, seq_length)
 
-    def _cal_longest_runs(self, block: numpy.ndarray):
-        prev_bit: int = block[0]
-        counter: int = 0
-        longest_ones_run_length: int = 0
-        longest_zeroes_run_length: int = 0
-        for bit in block:
-            if bit == prev_bit:
-                counter += 1
-            else:
-                if prev_bit == 0:
-                    longest_zeroes_run_length = counter if counter > longest_zeroes_run_length else longest_zeroes_run_length
-                else:
-                    longest_ones_run_length = counter if counter > longest_ones_run_length else longest_ones_run_length
-                counter = 1
-            prev_bit = bit
-        # deal with the last bit
-        if prev_bit == 0:
-                longest_zeroes_run_length = counter if counter > longest_zeroes_run_length else longest_zeroes_run_length
-        else:
-                longest_ones_run_length = counter if counter > longest_ones_run_length else longest_ones_run_length
-        return longest_ones_run_length, longest_zeroes_run_length
-
-
     def _execute(self,
                  bits: numpy.ndarray) -> Result:
         """
         Overridden method of Test class: check its docstring for further information.
         """
-        # Define the array of frequencies
-        ones_frequencies: numpy.ndarray = numpy.zeros(7, dtype=int)
-        zeroes_frequencies: numpy.ndarray = numpy.zeros(7, dtype=int)
         # Find longest run length in each block
-        for i in range(self._blocks_number):
-            block: numpy.ndarray = bits[i * self._block_size:((i + 1) * self._block_size)]
-            run_length: int = 0
-            # Count the length of each adjacent bits group (runs) in the current block and update the max length of them
-            longest_ones_run_length, longest_zeroes_run_length  = self._cal_longest_runs(block)
-            # Update the list of frequencies
-            if self._block_size == 8:
-                ones_frequencies[min(3, max(0, longest_ones_run_length - 1))] += 1
-                zeroes_frequencies[min(3, max(0, longest_zeroes_run_length - 1))] += 1
-            elif self._block_size == 128:
-                ones_frequencies[min(5, max(0, longest_ones_run_length - 4))] += 1
-                zeroes_frequencies[min(5, max(0, longest_zeroes_run_length - 4))] += 1
-            else:
-                ones_frequencies[min(6, max(0, longest_ones_run_length - 10))] += 1
-                zeroes_frequencies[min(6, max(0, longest_zeroes_run_length - 10))] += 1
-        # Compute Chi-square
-        zeroes_chi_square: float = 0.0
-        ones_chi_square: float = 0.0
-        for i in range(self._k + 1):
-            zeroes_chi_square += ((zeroes_frequencies[i] - self._blocks_number * self._probabilities(self._block_size, i)) ** 2) / (self._blocks_number * self._probabilities(self._block_size, i))
-            ones_chi_square += ((ones_frequencies[i] - self._blocks_number * self._probabilities(self._block_size, i)) ** 2) / (self._blocks_number * self._probabilities(self._block_size, i))
-        # Compute score (P-value)
-        score_1: float = scipy.special.gammaincc(self._k / 2.0, zeroes_chi_square / 2.0)
-        score_2: float = scipy.special.gammaincc(self._k / 2.0, ones_chi_square / 2.0)
+        longest_ones_run_lengths, longest_zeroes_run_lengths = self._longest_runs(bits.reshape((1, bits.size)))
+        # Compute the frequencies of the longest runs and then the scores (P-values)
+        score_1, score_2 = self._compute_scores(self._frequencies(longest_zeroes_run_lengths[0]), self._frequencies(longest_ones_run_lengths[0]))
         # Compute q-value
         q_value_1: float = score_1
         q_value_2: float = score_2
@@ -113,6 +69,75 @@ class LongestRunsInABlockTest(Test):
             return Result(self.name, True, numpy.array([score_1, score_2]), numpy.array([q_value_1, q_value_2]))
         return Result(self.name, False, numpy.array([score_1, score_2]), numpy.array([q_value_1, q_value_2]))
 
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        # Find the longest runs of the blocks of all the rows at once
+        longest_ones_run_lengths, longest_zeroes_run_lengths = self._longest_runs(context.bits)
+        scores_1, scores_2 = self._compute_scores(self._frequencies(longest_zeroes_run_lengths), self._frequencies(longest_ones_run_lengths))
+        scores: numpy.ndarray = numpy.stack((scores_1, scores_2), axis=1)
+        return scores, scores.copy()
+
+    def _longest_runs(self, bits_matrix: numpy.ndarray, chunk_size: int = 1 << 22) -> tuple:
+        """
+        Find the longest run of ones and of zeroes of every block of every row. The blocks of all the rows are
+        processed together, a range of whole blocks at a time to bound the temporary memory.
+        :param bits_matrix: the sequences of bits, wrapped in a 2D numpy array (ndarray) with a sequence per row
+        :param chunk_size: the number of bits (over all the rows) processed at a time
+        :return: the longest runs of ones and of zeroes, each in a 2D numpy array (ndarray) indexed by row and block
+        """
+        rows_number: int = bits_matrix.shape[0]
+        chunk_blocks: int = max(1, chunk_size // (rows_number * self._block_size))
+        longest_ones: list = []
+        longest_zeroes: list = []
+        for start in range(0, self._blocks_number, chunk_blocks):
+            blocks_number: int = min(chunk_blocks, self._blocks_number - start)
+            # The blocks of the range of all the rows one after the other
+            blocks: numpy.ndarray = bits_matrix[:, start * self._block_size:(start + blocks_number) * self._block_size].ravel()
+            ones, zeroes = longest_runs_in_blocks(blocks, self._block_size, rows_number * blocks_number)
+            longest_ones.append(ones.reshape((rows_number, blocks_number)))
+            longest_zeroes.append(zeroes.reshape((rows_number, blocks_number)))
+        if not longest_ones:
+            return numpy.zeros((rows_number, 0), dtype=numpy.int64), numpy.zeros((rows_number, 0), dtype=numpy.int64)
+        return numpy.concatenate(longest_ones, axis=1), numpy.concatenate(longest_zeroes, axis=1)
+
+    def _frequencies(self, longest_run_lengths: numpy.ndarray) -> numpy.ndarray:
+        """
+        Count the blocks in every class of longest run length (the classes depend on the block size).
+        :param longest_run_lengths: the longest run length of every block, wrapped in a numpy array (ndarray) whose last axis are the blocks
+        :return: the frequencies of the 7 classes, wrapped in a numpy array (ndarray) whose last axis are the classes
+        """
+        if self._block_size == 8:
+            classes: numpy.ndarray = numpy.clip(longest_run_lengths - 1, 0, 3)
+        elif self._block_size == 128:
+            classes: numpy.ndarray = numpy.clip(longest_run_lengths - 4, 0, 5)
+        else:
+            classes: numpy.ndarray = numpy.clip(longest_run_lengths - 10, 0, 6)
+        # Count the classes of every row at once with a single bincount
+        rows_number: int = int(numpy.prod(classes.shape[:-1]))
+        offsets: numpy.ndarray = (numpy.arange(rows_number, dtype=numpy.int64) * 7).reshape(classes.shape[:-1] + (1,))
+        return numpy.bincount((classes + offsets).ravel(), minlength=rows_number * 7).reshape(classes.shape[:-1] + (7,))
+
+    def _compute_scores(self, zeroes_frequencies: numpy.ndarray, ones_frequencies: numpy.ndarray) -> tuple:
+        """
+        Compute the scores (P-values) of the runs of zeroes and of ones given the frequencies of the longest runs.
+        :param zeroes_frequencies: the frequencies of the longest runs of zeroes, wrapped in a numpy array (ndarray) whose last axis are the classes
+        :param ones_frequencies: the frequencies of the longest runs of ones, wrapped in a numpy array (ndarray) whose last axis are the classes
+        :return: the score of the zeroes and the score of the ones (or the numpy arrays of them for every row)
+        """
+        import scipy.special
+        # Compute Chi-square
+        zeroes_chi_square = 0.0
+        ones_chi_square = 0.0
+        for i in range(self._k + 1):
+            zeroes_chi_square += ((zeroes_frequencies[..., i] - self._blocks_number * self._probabilities(self._block_size, i)) ** 2) / (self._blocks_number * self._probabilities(self._block_size, i))
+            ones_chi_square += ((ones_frequencies[..., i] - self._blocks_number * self._probabilities(self._block_size, i)) ** 2) / (self._blocks_number * self._probabilities(self._block_size, i))
+        # Compute score (P-value)
+        score_1 = scipy.special.gammaincc(self._k / 2.0, zeroes_chi_square / 2.0)
+        score_2 = scipy.special.gammaincc(self._k / 2.0, ones_chi_square / 2.0)
+        return score_1, score_2
 
     def __repr__(self) -> str:
         return f'{self.name}'
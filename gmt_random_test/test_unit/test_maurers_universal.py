@@ -28,6 +28,8 @@ class MaurersUniversalTest(Test):
     The significance value of the test is 0.01.
     """
 
+    BIT_COST: float = 28.0
+
     def __init__(self, seq_length: int, pattern_length: int = 7, q_blocks: int = 1280):
         # Define specific test attributes
         # Note: tables from https://static.aminer.org/pdf/PDF/000/120/333/a_universal_statistical_test_for_random_bit_generators.pdf
@@ -48,25 +50,8 @@ class MaurersUniversalTest(Test):
         blocks_number: int = int(bits.size // self._pattern_length)
         q_blocks: int = self._q_blocks
         k_blocks: int = blocks_number - q_blocks
-        # Construct table of symbols all zeroed out at the beginning
-        table: numpy.ndarray = numpy.zeros(2 ** self._pattern_length, dtype=int)
-        # Mark final position in Q-blocks
-        for i in range(q_blocks):
-            # Get the pattern in the Q-block
-            pattern: numpy.ndarray = bits[i * self._pattern_length:(i + 1) * self._pattern_length]
-            # +1 to number indexes 1... (2 ** L) + 1 instead of 0... 2 ** L
-            table[self._pattern_to_int(pattern)] = i + 1
-        # Mark final position in K-blocks and compute the sum
-        computed_sum: float = 0.0
-        for i in range(q_blocks, blocks_number):
-            # Get the pattern in the K-block
-            pattern: numpy.ndarray = bits[i * self._pattern_length:(i + 1) * self._pattern_length]
-            # Compute difference with respect to the current value in the table
-            difference: int = i + 1 - table[self._pattern_to_int(pattern)]
-            # Update the current value in the table
-            table[self._pattern_to_int(pattern)] = i + 1
-            # Update the computed sum
-            computed_sum += math.log(difference, 2)
+        blocks: numpy.ndarray = bits[:blocks_number * self._pattern_length].reshape((blocks_number, self._pattern_length))
+        computed_sum: float = self._sum_log_distances(blocks, q_blocks)
         # Compute the test statistic
         fn: float = computed_sum / k_blocks
         c: float = 0.7 - 0.8 / self._pattern_length + (4 + 32 / self._pattern_length) * (k_blocks ** (-3 / self._pattern_length) / 15)
@@ -81,17 +66,53 @@ class MaurersUniversalTest(Test):
             return Result(self.name, True, numpy.array([score]), numpy.array([q_value]))
         return Result(self.name, False, numpy.array([score]), numpy.array([q_value]))
 
-    @staticmethod
-    def _pattern_to_int(bit_pattern: numpy.ndarray) -> int:
+    def _sum_log_distances(self, blocks: numpy.ndarray, q_blocks: int, chunk_size: int = 1 << 20) -> float:
         """
-        Convert the given pattern of bits to an integer value.
-        :param bit_pattern: the bit pattern to convert
-        :return: the integer value identifying the pattern
+        Sum the base 2 logarithms of the distances of the K-blocks (the blocks after the first Q) from the last
+        occurrence of their pattern, adding the terms in the order of the blocks. The blocks are processed a range at a
+        time, keeping the last occurrence of every pattern, so the temporary memory does not grow with their number.
+        :param blocks: the blocks of bits, one per row, wrapped in a 2D numpy array (ndarray)
+        :param q_blocks: the number Q of initialization blocks
+        :param chunk_size: the number of blocks processed at a time
+        :return: the sum of the logarithms
         """
-        result: int = 0
-        for bit in bit_pattern:
-            result = (result << 1) + bit
-        return result
+        blocks_number: int = blocks.shape[0]
+        # The last block of every pattern seen so far (-1 if there is none)
+        last_occurrences: numpy.ndarray = numpy.full(2 ** self._pattern_length, -1, dtype=numpy.int64)
+        computed_sum: float = None
+        for start in range(0, blocks_number, chunk_size):
+            end: int = min(start + chunk_size, blocks_number)
+            # Compute the integer value of the patterns of the blocks of the range at once
+            patterns: numpy.ndarray = numpy.zeros(end - start, dtype=numpy.int32)
+            for k in range(self._pattern_length):
+                patterns <<= 1
+                patterns |= blocks[start:end, k]
+            # Find the previous block with the same pattern of every block: after a stable sort of the patterns, the
+            # previous occurrence of a block is the block before it in the sorted order, unless a new pattern starts
+            # there (then it is the last occurrence before the range)
+            order: numpy.ndarray = numpy.argsort(patterns, kind="stable")
+            sorted_patterns: numpy.ndarray = patterns[order]
+            new_patterns: numpy.ndarray = numpy.concatenate((numpy.array([True]), sorted_patterns[1:] != sorted_patterns[:-1]))
+            previous_sorted: numpy.ndarray = numpy.concatenate((numpy.array([-1]), order[:-1] + start))
+            previous_sorted[new_patterns] = last_occurrences[sorted_patterns[new_patterns]]
+            previous_occurrences: numpy.ndarray = numpy.empty(end - start, dtype=numpy.int64)
+            previous_occurrences[order] = previous_sorted
+            last_patterns: numpy.ndarray = numpy.append(new_patterns[1:], True)
+            last_occurrences[sorted_patterns[last_patterns]] = order[last_patterns] + start
+            # Compute the distance of every K-block from the last occurrence of its pattern (as if the positions were
+            # numbered 1... blocks_number and a pattern not seen before was last seen at 0)
+            first_k_block: int = max(q_blocks, start)
+            differences: numpy.ndarray = numpy.arange(first_k_block, end) - previous_occurrences[first_k_block - start:]
+            if differences.size == 0:
+                continue
+            # Compute the logarithm of every distinct distance once, then add the terms in the order of the blocks
+            distances, inverse = numpy.unique(differences, return_inverse=True)
+            logarithms: numpy.ndarray = numpy.array([math.log(int(distance), 2) for distance in distances], dtype=float)
+            terms: numpy.ndarray = logarithms[inverse.reshape(-1)]
+            if computed_sum is not None:
+                terms = numpy.concatenate((numpy.array([computed_sum]), terms))
+            computed_sum = float(numpy.cumsum(terms)[-1])
+        return 0.0 if computed_sum is None else computed_sum
 
     def __repr__(self) -> str:
         return f'{self.name}'
\ No newline at end of file
@@ -17,6 +17,8 @@ import math
 # Import required src
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
+from gmt_random_test.packed import PackedSequence, count_ones
 
 
 class MonobitTest(Test):
@@ -38,15 +40,48 @@ class MonobitTest(Test):
         """
         Overridden method of Test class: check its docstring for further information.
         """
-        # Compute ones and zeroes
+        # Compute ones
         ones: int = numpy.count_nonzero(bits)
-        zeroes: int = bits.size - ones
+        return self._compute_result(ones, bits.size)
+
+    def _execute_packed(self,
+                        packed: PackedSequence):
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        # Compute ones with a popcount of the packed words
+        ones: int = count_ones(packed.words)
+        return self._compute_result(ones, packed.size)
+
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        import scipy.special
+        # Compute ones of every row
+        ones: numpy.ndarray = context.ones()
+        difference: numpy.ndarray = 2 * ones - context.size
+        # Compute scores and q_values of all the rows at once
+        scores: numpy.ndarray = scipy.special.erfc(numpy.abs(difference) / (math.sqrt(float(context.size)) * math.sqrt(2.0)))
+        q_values: numpy.ndarray = scipy.special.erfc(difference / (math.sqrt(float(context.size)) * math.sqrt(2.0))) / 2.0
+        return scores, q_values
+
+    def _compute_result(self, ones: int, size: int) -> Result:
+        """
+        Compute the Result of the test given the number of ones in the sequence.
+        :param ones: the number of ones in the sequence
+        :param size: the number of bits in the sequence
+        :return: a Result object stating the outcome of the test
+        """
+        # Compute zeroes
+        zeroes: int = size - ones
         # Compute difference
         difference: int = (ones - zeroes)
         # Compute score
-        score: float = math.erfc(float(abs(difference)) / (math.sqrt(float(bits.size)) * math.sqrt(2.0)))
+        score: float = math.erfc(float(abs(difference)) / (math.sqrt(float(size)) * math.sqrt(2.0)))
 	    # Compute q_value
-        q_value: float = math.erfc(float(difference) / (math.sqrt(float(bits.size)) * math.sqrt(2.0))) / 2.0
+        q_value: float = math.erfc(float(difference) / (math.sqrt(float(size)) * math.sqrt(2.0))) / 2.0
         # Return result
         if score >= self.significance_value:
             return Result(self.name, True, numpy.array([score]), numpy.array([q_value]))
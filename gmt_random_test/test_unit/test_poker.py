@@ -12,11 +12,12 @@
 # Import packages
 
 import numpy
-import scipy.special
 
 # Import required src
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
+from gmt_random_test.packed import PackedSequence
 
 
 class PokerTest(Test):
@@ -27,6 +28,8 @@ class PokerTest(Test):
     The significance value of the test is 0.01.
     """
 
+    BIT_COST: float = 2.0
+
     def __init__(self, seq_length: int, block_size: int  = 4):
         # Define attributes
         self._block_size: int = block_size
@@ -41,21 +44,100 @@ class PokerTest(Test):
         """
         Overridden method of Test class: check its docstring for further information.
         """
-        # Initialize a list of counting patterns (2 ^ block_size patterns in total)
-        counter: numpy.ndarray = numpy.zeros(self._patterns_num, dtype=int)
-        # reshape vectors discard the redundant bits
-        poker_blocks: numpy.ndarray = numpy.reshape(bits.copy()[: self._seq_size], (self._blocks_number, self._block_size))
-        # convert into uint8 patterns
-        patterns: numpy.ndarray = numpy.packbits(poker_blocks, axis=1, bitorder='little')
-        for i in range(self._blocks_number):
-            # current pattern
-            pattern: int = patterns[i]
-            # Compute ones and save the fraction in the array
-            counter[pattern] += 1
+        # Count the patterns of the blocks (discarding the redundant bits, without copying the sequence)
+        counter: numpy.ndarray = self._count_patterns(bits.reshape((1, bits.size)))[0]
+        return self._compute_result(counter)
+
+    def _execute_packed(self,
+                        packed: PackedSequence) -> Result:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        if self._block_size not in (4, 8):
+            return self._execute(packed.unpack())
+        counter: numpy.ndarray = self._count_packed_patterns(packed.bytes.reshape((1, packed.bytes.size)))[0]
+        return self._compute_result(counter)
+
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        if self._block_size in (4, 8):
+            counter: numpy.ndarray = self._count_packed_patterns(context.packed_bytes())
+        else:
+            counter: numpy.ndarray = self._count_patterns(context.bits)
+        # Compute scores (P-values) of all the rows at once, q_value = p_value
+        scores: numpy.ndarray = self._compute_scores(counter)
+        return scores, scores.copy()
+
+    def _count_patterns(self,
+                        bits_matrix: numpy.ndarray) -> numpy.ndarray:
+        """
+        Count the patterns of the blocks of every row.
+        :param bits_matrix: the sequences of bits, wrapped in a 2D numpy array (ndarray) with a sequence per row
+        :return: the counts of the 2^m patterns of every row, in a 2D numpy array (ndarray)
+        """
+        rows_number: int = bits_matrix.shape[0]
+        # Compute the pattern of every block of every row (discarding the redundant bits)
+        poker_blocks: numpy.ndarray = bits_matrix[:, :self._seq_size].reshape(rows_number, self._blocks_number, self._block_size)
+        patterns: numpy.ndarray = numpy.dot(poker_blocks, 1 << numpy.arange(self._block_size, dtype=numpy.int64))
+        return self._count_rows_patterns(patterns)
+
+    def _count_packed_patterns(self,
+                               packed_bytes: numpy.ndarray) -> numpy.ndarray:
+        """
+        Count the patterns of the blocks of every row of packed bytes, when the blocks are bytes (m=8) or nibbles (m=4).
+        The patterns are numbered most significant bit first here, the chi-square does not depend on the numbering.
+        :param packed_bytes: the sequences packed by rows as numpy.packbits does, wrapped in a 2D numpy array (ndarray)
+        :return: the counts of the 2^m patterns of every row, in a 2D numpy array (ndarray)
+        """
+        if self._block_size == 8:
+            # Every byte is a block
+            patterns: numpy.ndarray = packed_bytes[:, :self._blocks_number]
+        else:
+            # Every nibble is a block, in the order of the sequence
+            blocks_bytes: numpy.ndarray = packed_bytes[:, :(self._blocks_number + 1) // 2]
+            patterns: numpy.ndarray = numpy.stack((blocks_bytes >> 4, blocks_bytes & 0x0F), axis=2).reshape((packed_bytes.shape[0], -1))[:, :self._blocks_number]
+        return self._count_rows_patterns(patterns)
+
+    def _count_rows_patterns(self,
+                             patterns: numpy.ndarray, chunk_size: int = 1 << 22) -> numpy.ndarray:
+        """
+        Count the patterns of every row with a bincount per range of columns (bounding the temporary memory).
+        :param patterns: the pattern of every block of every row, wrapped in a 2D numpy array (ndarray)
+        :param chunk_size: the number of patterns (over all the rows) counted at a time
+        :return: the counts of the 2^m patterns of every row, in a 2D numpy array (ndarray)
+        """
+        rows_number: int = patterns.shape[0]
+        counter: numpy.ndarray = numpy.zeros(rows_number * self._patterns_num, dtype=numpy.int64)
+        offsets: numpy.ndarray = numpy.arange(rows_number, dtype=numpy.int64)[:, numpy.newaxis] * self._patterns_num
+        columns_number: int = max(1, chunk_size // max(rows_number, 1))
+        for start in range(0, patterns.shape[1], columns_number):
+            # Count the patterns of all the rows at once, offsetting the patterns of each row
+            indexes: numpy.ndarray = patterns[:, start:start + columns_number].astype(numpy.int64) + offsets
+            counter += numpy.bincount(indexes.ravel(), minlength=counter.size)
+        return counter.reshape(rows_number, self._patterns_num)
+
+    def _compute_scores(self, counter: numpy.ndarray):
+        """
+        Compute the score (P-value) given the counts of the patterns.
+        :param counter: the counts of the patterns, wrapped in a numpy array (ndarray) whose last axis are the patterns
+        :return: the score, or the numpy array of scores of every row
+        """
+        import scipy.special
         # Compute Chi-square
-        chi_square: float = (self._patterns_num / self._blocks_number) * numpy.sum((counter ** 2)) - self._blocks_number
+        chi_square = (self._patterns_num / self._blocks_number) * numpy.sum((counter ** 2), axis=-1) - self._blocks_number
         # Compute score (P-value) applying the lower incomplete gamma function
-        score: float = scipy.special.gammaincc((self._patterns_num -1) / 2.0, chi_square / 2.0)
+        return scipy.special.gammaincc((self._patterns_num -1) / 2.0, chi_square / 2.0)
+
+    def _compute_result(self, counter: numpy.ndarray) -> Result:
+        """
+        Compute the Result of the test given the counts of the patterns.
+        :param counter: the counts of the 2^m patterns, wrapped in a numpy array (ndarray)
+        :return: a Result object stating the outcome of the test
+        """
+        score: float = self._compute_scores(counter)
         # q_value = p_value
         q_value: float = score
         # Return result
@@ -63,6 +145,5 @@ class PokerTest(Test):
             return Result(self.name, True, numpy.array([score]), numpy.array([q_value]))
         return Result(self.name, False, numpy.array([score]), numpy.array([q_value]))
 
-
     def __repr__(self) -> str:
         return f'{self.name} (m={self._block_size})'
@@ -17,6 +17,7 @@ import math
 # Import required src
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
 
 
 class RunsTest(Test):
@@ -30,6 +31,8 @@ class RunsTest(Test):
     The significance value of the test is 0.01.
     """
 
+    BIT_COST: float = 2.0
+
     def __init__(self, seq_length: int):
         # Generate base Test class
         super(RunsTest, self).__init__("Runs", 0.01, seq_length)
@@ -40,11 +43,8 @@ class RunsTest(Test):
         Overridden method of Test class: check its docstring for further information.
         """
         proportion: float = numpy.count_nonzero(bits) / bits.size
-        # Count the observed runs (list of adjacent equal bits)
-        observed_runs: float = 1.0
-        for i in range(bits.size - 1):
-            if bits[i] != bits[i + 1]:
-                observed_runs += 1.0
+        # Count the observed runs (list of adjacent equal bits): every change of bit starts a new run
+        observed_runs: float = float(numpy.count_nonzero(bits[1:] != bits[:-1]) + 1)
         # Compute score (P-value)
         tmp: float = (observed_runs - (2.0 * bits.size * proportion * (1.0 - proportion))) / (2.0 * math.sqrt(bits.size) * proportion * (1 - proportion))
         # score: float = math.erfc(abs(observed_runs - (2.0 * bits.size * proportion * (1.0 - proportion))) / (2.0 * math.sqrt(2.0 * bits.size) * proportion * (1 - proportion)))
@@ -55,6 +55,30 @@ class RunsTest(Test):
             return Result(self.name, True, numpy.array([score]), numpy.array([q_value]))
         return Result(self.name, False, numpy.array([score]), numpy.array([q_value]))
 
+    def prepare_batch(self,
+                      context: SequenceContext):
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        context.request_autocorrelation_lag(1)
+
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        import scipy.special
+        size: int = context.size
+        proportions: numpy.ndarray = context.ones() / size
+        # Count the observed runs of every row (list of adjacent equal bits): every change of bit starts a new run, and
+        # the changes are the ones of the XOR of the row with itself shifted by one bit (counted with the lags)
+        observed_runs: numpy.ndarray = (context.autocorrelation_ones(1) + 1).astype(float)
+        # Compute scores (P-values) and q_values of all the rows at once
+        tmp: numpy.ndarray = (observed_runs - (2.0 * size * proportions * (1.0 - proportions))) / (2.0 * math.sqrt(size) * proportions * (1 - proportions))
+        scores: numpy.ndarray = scipy.special.erfc(numpy.abs(tmp) / math.sqrt(2.0))
+        q_values: numpy.ndarray = scipy.special.erfc(tmp / math.sqrt(2.0)) / 2.0
+        return scores, q_values
+
     def __repr__(self) -> str:
         return f'{self.name}'
 
@@ -12,12 +12,13 @@
 # Import packages
 
 import numpy
-import scipy
 import math
 
 # Import required src
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
+from gmt_random_test.functions import count_runs_by_length
 
 
 class RunsDistributionTest(Test):
@@ -28,6 +29,8 @@ class RunsDistributionTest(Test):
     The significance value of the test is 0.01.
     """
 
+    BIT_COST: float = 35.0
+
     # require bits length to pre-compute the table
     def __init__(self, seq_length: int, bits_length: int = 100):
         self._bits_length = bits_length
@@ -44,32 +47,16 @@ class RunsDistributionTest(Test):
 
     def _cal_runs(self,
                   bits: numpy.ndarray, ones_runs: numpy.ndarray, zeroes_runs: numpy.ndarray):
-        prev_bit: int = bits[0]
-        counter: int = 0
-        for bit in bits:
-            if bit == prev_bit:
-                counter += 1
-            else:
-                counter = counter if counter <= self._k else self._k
-                if prev_bit == 0:
-                    zeroes_runs[counter] += 1
-                else:
-                    ones_runs[counter] += 1
-                counter = 1
-            prev_bit = bit
-        # deal with the last bit
-        counter = counter if counter <= self._k else self._k
-        if prev_bit == 0:
-                zeroes_runs[counter] += 1
-        else:
-                ones_runs[counter] += 1
+        counts: numpy.ndarray = count_runs_by_length(bits.reshape((1, bits.size)), self._k)
+        zeroes_runs += counts[0, 0]
+        ones_runs += counts[0, 1]
 
-    def _compute_runs_table(self, total: int) -> numpy.ndarray:
-        result: numpy.ndarray = numpy.zeros(self._k + 1)
-        result[0] = 1
+    def _compute_runs_table(self, total) -> numpy.ndarray:
+        result: numpy.ndarray = numpy.zeros(numpy.shape(total) + (self._k + 1,))
+        result[..., 0] = 1
         for i in range(1, self._k):
-            result[i] = total / 2 ** (i + 1)
-        result[self._k] = total / 2 ** (self._k)
+            result[..., i] = total / 2 ** (i + 1)
+        result[..., self._k] = total / 2 ** (self._k)
         return result
 
     def _execute(self,
@@ -83,21 +70,43 @@ class RunsDistributionTest(Test):
         zeroes_runs: numpy.ndarray = numpy.zeros(self._k + 1, dtype=int)
         ones_runs: numpy.ndarray = numpy.zeros(self._k + 1, dtype=int)
         self._cal_runs(bits, ones_runs, zeroes_runs)
-        total: int = numpy.sum(zeroes_runs + ones_runs)
-        runs_table: numpy.ndarray = self._compute_runs_table(total)
-        tmp_1: numpy.ndarray = (zeroes_runs - runs_table) ** 2 / runs_table
-        tmp_2: numpy.ndarray = (ones_runs - runs_table) ** 2 / runs_table
-        tmp_1[0] = 0
-        tmp_2[0] = 0
-        chi_square: float = numpy.sum(tmp_1) + numpy.sum(tmp_2)
-
         # Compute score (P-value) applying the lower incomplete gamma function
-        score: float = scipy.special.gammaincc(self._k - 1, chi_square / 2.0)
+        score: float = self._compute_scores(zeroes_runs, ones_runs)
         # q_value = p_value
         q_value: float = score
         if score >= self.significance_value:
             return Result(self.name, True, numpy.array([score]), numpy.array([q_value]))
         return Result(self.name, False, numpy.array([score]), numpy.array([q_value]))
 
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        if self._table is None:
+            self._compute_table()
+        # Count the runs of all the rows at once, keeping the runs of every row apart
+        counts: numpy.ndarray = count_runs_by_length(context.bits, self._k)
+        scores: numpy.ndarray = self._compute_scores(counts[:, 0], counts[:, 1])
+        return scores, scores.copy()
+
+    def _compute_scores(self, zeroes_runs: numpy.ndarray, ones_runs: numpy.ndarray):
+        """
+        Compute the score (P-value) given the counts of the runs of zeroes and ones of every length.
+        :param zeroes_runs: the counts of the runs of zeroes, wrapped in a numpy array (ndarray) whose last axis is the run length
+        :param ones_runs: the counts of the runs of ones, wrapped in a numpy array (ndarray) whose last axis is the run length
+        :return: the score, or the numpy array of scores of every row
+        """
+        import scipy.special
+        total = numpy.sum(zeroes_runs + ones_runs, axis=-1)
+        runs_table: numpy.ndarray = self._compute_runs_table(total)
+        tmp_1: numpy.ndarray = (zeroes_runs - runs_table) ** 2 / runs_table
+        tmp_2: numpy.ndarray = (ones_runs - runs_table) ** 2 / runs_table
+        tmp_1[..., 0] = 0
+        tmp_2[..., 0] = 0
+        chi_square = numpy.sum(tmp_1, axis=-1) + numpy.sum(tmp_2, axis=-1)
+        # Compute score (P-value) applying the lower incomplete gamma function
+        return scipy.special.gammaincc(self._k - 1, chi_square / 2.0)
+
     def __repr__(self) -> str:
         return f'{self.name}'
@@ -13,11 +13,12 @@
 
 import numpy
 import math
-import scipy.special
 
 # Import required src
 
 from gmt_random_test import Test, Result
+from gmt_random_test.context import SequenceContext
+from gmt_random_test.functions import count_overlapping_patterns, marginalize_pattern_counts
 
 
 class SerialTest(Test):
@@ -32,6 +33,8 @@ class SerialTest(Test):
     The significance value of the test is 0.01.
     """
 
+    BIT_COST: float = 12.0
+
     def __init__(self, seq_length: int, pattern_length: int = 4):
         # Define specific test attributes
         self._pattern_length: int = pattern_length
@@ -43,17 +46,11 @@ class SerialTest(Test):
         """
         Overridden method of Test class: check its docstring for further information.
         """
-        # Pad the sequence
-        padded_bits: numpy.ndarray = numpy.concatenate((bits, bits[0:self._pattern_length - 1]))
-        # Compute Psi-Squared statistics
-        psi_sq_m_0: float = self._psi_sq_mv1(self._pattern_length, bits.size, padded_bits)
-        psi_sq_m_1: float = self._psi_sq_mv1(self._pattern_length - 1, bits.size, padded_bits)
-        psi_sq_m_2: float = self._psi_sq_mv1(self._pattern_length - 2, bits.size, padded_bits)
-        delta_1: float = psi_sq_m_0 - psi_sq_m_1
-        delta_2: float = psi_sq_m_0 - (2 * psi_sq_m_1) + psi_sq_m_2
+        # Count the overlapping patterns once, the counts of the shorter patterns are derived from them
+        counts_m_0: numpy.ndarray = count_overlapping_patterns(bits, self._pattern_length)
+        counts: list = [marginalize_pattern_counts(counts_m_0, self._pattern_length - i) for i in range(3)]
         # Compute the scores (P-values)
-        score_1: float = scipy.special.gammaincc(2 ** (self._pattern_length - 2), delta_1 / 2.0)
-        score_2: float = scipy.special.gammaincc(2 ** (self._pattern_length - 3), delta_2 / 2.0)
+        score_1, score_2 = self._compute_scores(counts, bits.size)
         # Compute q-values
         q_value_1: float = score_1
         q_value_2: float = score_2
@@ -62,6 +59,42 @@ class SerialTest(Test):
             return Result(self.name, True, numpy.array([score_1, score_2]), numpy.array([q_value_1, q_value_2]))
         return Result(self.name, False, numpy.array([score_1, score_2]), numpy.array([q_value_1, q_value_2]))
 
+    def prepare_batch(self,
+                      context: SequenceContext):
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        context.request_pattern_length(self._pattern_length)
+
+    def _execute_batch(self,
+                       context: SequenceContext) -> tuple:
+        """
+        Overridden method of Test class: check its docstring for further information.
+        """
+        # The counts of the overlapping patterns of every row are shared with the other tests on the same sequences
+        counts: list = [context.pattern_counts(self._pattern_length - i) for i in range(3)]
+        scores: numpy.ndarray = numpy.stack(self._compute_scores(counts, context.size), axis=1)
+        return scores, scores.copy()
+
+    def _compute_scores(self, counts: list, sequence_size: int) -> tuple:
+        """
+        Compute the two scores (P-values) given the counts of the overlapping patterns of length m, m - 1 and m - 2.
+        :param counts: the counts of the patterns of length m, m - 1 and m - 2, each wrapped in a numpy array (ndarray) whose last axis are the patterns
+        :param sequence_size: the size of the sequence of bits
+        :return: the two scores (or the numpy arrays of them for every row)
+        """
+        import scipy.special
+        # Compute Psi-Squared statistics
+        psi_sq_m_0 = self._psi_sq_mv1(self._pattern_length, sequence_size, counts[0])
+        psi_sq_m_1 = self._psi_sq_mv1(self._pattern_length - 1, sequence_size, counts[1])
+        psi_sq_m_2 = self._psi_sq_mv1(self._pattern_length - 2, sequence_size, counts[2])
+        delta_1 = psi_sq_m_0 - psi_sq_m_1
+        delta_2 = psi_sq_m_0 - (2 * psi_sq_m_1) + psi_sq_m_2
+        # Compute the scores (P-values)
+        score_1 = scipy.special.gammaincc(2 ** (self._pattern_length - 2), delta_1 / 2.0)
+        score_2 = scipy.special.gammaincc(2 ** (self._pattern_length - 3), delta_2 / 2.0)
+        return score_1, score_2
+
     # def is_eligible(self,
     #                 bits: numpy.ndarray) -> bool:
     #     """
@@ -72,44 +105,20 @@ class SerialTest(Test):
     #         return False
     #     return True
 
-    @staticmethod
-    def _count_pattern(pattern: numpy.ndarray, padded_sequence: numpy.ndarray, sequence_size: int) -> int:
-        """
-        Count the matches in the padded sequence of the given size with the given pattern.
-        :param pattern: the pattern to match against
-        :param padded_sequence: the sequence of bits once padded
-        :param sequence_size: the size of the original sequence of bits
-        :return: the integer value of the count
-        """
-        count: int = 0
-        for i in range(sequence_size):
-            match: bool = True
-            for j in range(len(pattern)):
-                if pattern[j] != padded_sequence[i + j]:
-                    match = False
-            if match:
-                count += 1
-        return count
-
     def __repr__(self) -> str:
         return f'{self.name} (m={self._pattern_length})'
 
     @staticmethod
-    def _psi_sq_mv1(block_size: int, sequence_size: int, padded_sequence: numpy.ndarray) -> float:
+    def _psi_sq_mv1(block_size: int, sequence_size: int, counts: numpy.ndarray) -> float:
         """
         Compute the Psi-Squared statistics from the NIST paper.
         :param block_size: the size of the block
         :param sequence_size: the size of the sequence of bits
-        :param padded_sequence: the original sequence once padded
-        :return: the float value of Psi-Squared statistics
+        :param counts: the counts of all the overlapping patterns of the given block size (on the last axis)
+        :return: the float value of Psi-Squared statistics (or a numpy array of them)
         """
-        # Count the patterns
-        counts: numpy.ndarray = numpy.zeros(2 ** block_size, dtype=int)
-        for i in range(2 ** block_size):
-            pattern: numpy.ndarray = (i >> numpy.arange(block_size, dtype=int)) & 1
-            counts[i] = SerialTest._count_pattern(pattern, padded_sequence, sequence_size)
         # Compute Psi-Squared statistics and return it
-        psi_sq_m: float = numpy.sum(counts[:] ** 2)
-        psi_sq_m *= (2 ** block_size) / sequence_size
+        psi_sq_m: float = numpy.sum(counts[:] ** 2, axis=-1)
+        psi_sq_m = psi_sq_m * ((2 ** block_size) / sequence_size)
         psi_sq_m -= sequence_size
         return psi_sq_m
\ No newline at end of file
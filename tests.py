@@ -1,11 +1,17 @@
 import numpy
-from gmt_random_test.functions import pack_01str, pack_sequence
-from gmt_random_test.qvalues import QValueCollector
-from gmt_random_test.test import Result
+import os
+import tempfile
+from gmt_random_test.functions import count_runs_by_length, pack_01str, pack_sequence
+from gmt_random_test.gmt_randomness_test import GmtRandomnessTest, ScreeningReport
+from gmt_random_test.monitor import SlidingWindowMonitor
+from gmt_random_test.packed import PackedSequence
+from gmt_random_test.profiling import Profiler
+from gmt_random_test.qvalues import QValueAccumulator, QValueCollector, interval_counts
+from gmt_random_test.test import Result, ResultTable
 from gmt_random_test.test_unit.test_approximate_entropy import ApproximateEntropyTest
 from gmt_random_test.test_unit.test_autocorrelation import AutocorrelationTest
 from gmt_random_test.test_unit.test_binary_derivative import BinaryDerivativeTest
-from gmt_random_test.test_unit.test_binary_matrix_rank import BinaryMatrixRankTest
+from gmt_random_test.test_unit.test_binary_matrix_rank import BinaryMatrix, BinaryMatrixRankTest
 from gmt_random_test.test_unit.test_cumulative_sums import CumulativeSumsTest
 from gmt_random_test.test_unit.test_discrete_fourier_transform import DiscreteFourierTransformTest
 from gmt_random_test.test_unit.test_frequency_within_block import FrequencyWithinBlockTest
@@ -34,6 +40,56 @@ longest_runs_seq = "110011000001010101101100010011001110000000000010010011010101
 q_values_list = [0.05, 0.05, 0.15, 0.15, 0.15, 0.15, 0.15, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.35, 0.35, 0.35, 0.35, 0.35, 0.35, 0.35, 0.45, 0.45, 0.55, 0.55, 0.55, 0.55, 0.55, 0.65, 0.65, 0.75, 0.75, 0.75, 0.75, 0.75, 0.75, 0.75, 0.75, 0.85, 0.85, 0.85, 0.85, 0.85, 0.85, 0.85, 0.85, 0.85, 0.95, 0.95]
 
 
+def baseline_berlekamp_massey(block_data: numpy.ndarray) -> int:
+        """
+        The Berlekamp Massey Algorithm as first written for LinearComplexityTest, one coefficient at a time.
+        :param block_data: the bits of the block
+        :return: the linear complexity of the block
+        """
+        n = len(block_data)
+        c = numpy.zeros(n)
+        b = numpy.zeros(n)
+        c[0], b[0] = 1, 1
+        l, m = 0, -1
+        int_data = [int(el) for el in block_data]
+        for i in range(n):
+            d = (int_data[i] + numpy.dot(int_data[(i - l):i][::-1], c[1:l + 1])) % 2
+            if d == 1:
+                temp = numpy.copy(c)
+                p = numpy.zeros(n)
+                for j in range(0, l):
+                    if b[j] == 1:
+                        p[j + i - m] = 1
+                c = (c + p) % 2
+                if l <= 0.5 * i:
+                    l = i + 1 - l
+                    m = i
+                    b = temp
+        return l
+
+
+def baseline_rank(matrix: numpy.ndarray) -> int:
+        """
+        The NIST binary rank as first written for BinaryMatrix, one row operation at a time.
+        :param matrix: the bits of the matrix, wrapped in a 2D numpy array (ndarray)
+        :return: the binary rank of the matrix
+        """
+        matrix = matrix.copy()
+        rows_number, columns_number = matrix.shape
+        base_rank: int = min(rows_number, columns_number)
+        # Forward elimination then backward elimination, swapping in the first row below (above) with a one in column i
+        for i, others in [(i, range(i + 1, rows_number)) for i in range(base_rank - 1)] + [(i, range(i - 1, -1, -1)) for i in range(base_rank - 1, 0, -1)]:
+            if matrix[i][i] == 0:
+                pivot: int = next((j for j in others if matrix[j][i] == 1), None)
+                if pivot is None:
+                    continue
+                matrix[[i, pivot]] = matrix[[pivot, i]]
+            for j in others:
+                if matrix[j][i] == 1:
+                    matrix[j, :] = (matrix[j, :] + matrix[i, :]) % 2
+        return base_rank - int(numpy.count_nonzero(~matrix.any(axis=1)))
+
+
 if __name__ == "__main__":
         result : Result = None
         time: int = 0
@@ -45,6 +101,18 @@ if __name__ == "__main__":
         result ,time = monobit_test.run(pack_01str(monobit_test_seq))
         print(result)
 
+        '''
+        Monobit test (packed input)
+        '''
+        result ,time = monobit_test.run(PackedSequence.from_bits(pack_01str(monobit_test_seq)))
+        print(result)
+
+        '''
+        Monobit test (batch of sequences)
+        '''
+        scores, q_values, passed = monobit_test.run_batch(numpy.array([pack_01str(monobit_test_seq)] * 2))
+        print(scores, q_values, passed)
+
         '''
         Frequency within block test
         '''
@@ -52,6 +120,12 @@ if __name__ == "__main__":
         result, time = frequency_test.run(pack_01str(frequency_within_block_seq))
         print(result)
 
+        '''
+        Frequency within block test (batch of sequences)
+        '''
+        scores, q_values, passed = frequency_test.run_batch(numpy.array([pack_01str(frequency_within_block_seq)] * 2))
+        print(scores, q_values, passed)
+
         '''
         Serial test
         '''
@@ -59,6 +133,12 @@ if __name__ == "__main__":
         result, time = serial_test.run(pack_01str(serial_seq))
         print(result)
 
+        '''
+        Serial test (batch of sequences)
+        '''
+        scores, q_values, passed = serial_test.run_batch(numpy.array([pack_01str(serial_seq)] * 2))
+        print(scores, q_values, passed)
+
         '''
         Poker test
         '''
@@ -66,6 +146,12 @@ if __name__ == "__main__":
         result, time = poker_test.run(pack_01str(poker_seq))
         print(result)
 
+        '''
+        Poker test (batch of sequences)
+        '''
+        scores, q_values, passed = poker_test.run_batch(numpy.array([pack_01str(poker_seq)] * 2))
+        print(scores, q_values, passed)
+
         '''
         Autocorrelation test
         '''
@@ -73,6 +159,12 @@ if __name__ == "__main__":
         result, time = auto_test.run(pack_01str(auto_seq))
         print(result)
 
+        '''
+        Autocorrelation test (batch of sequences)
+        '''
+        scores, q_values, passed = auto_test.run_batch(numpy.array([pack_01str(auto_seq)] * 2))
+        print(scores, q_values, passed)
+
         '''
         Autocorrelation test
         '''
@@ -80,6 +172,12 @@ if __name__ == "__main__":
         result, time = derivative_test.run(pack_01str(derivative_seq))
         print(result)
 
+        '''
+        Binary derivative test (batch of sequences)
+        '''
+        scores, q_values, passed = derivative_test.run_batch(numpy.array([pack_01str(derivative_seq)] * 2))
+        print(scores, q_values, passed)
+
         '''
         Runs test
         '''
@@ -87,6 +185,12 @@ if __name__ == "__main__":
         result, time = runs_test.run(pack_01str(runs_seq))
         print(result)
 
+        '''
+        Runs test (batch of sequences)
+        '''
+        scores, q_values, passed = runs_test.run_batch(numpy.array([pack_01str(runs_seq)] * 2))
+        print(scores, q_values, passed)
+
         '''
         Runs Distribution test
         '''
@@ -94,6 +198,12 @@ if __name__ == "__main__":
         result, time = runs_dist_test.run(pack_01str(runs_dist_seq))
         print(result)
 
+        '''
+        Runs Distribution test (batch of sequences)
+        '''
+        scores, q_values, passed = runs_dist_test.run_batch(numpy.array([pack_01str(runs_dist_seq)] * 2))
+        print(scores, q_values, passed)
+
         '''
         Longest runs in a block test
         '''
@@ -101,6 +211,12 @@ if __name__ == "__main__":
         result, time = longest_runs_test.run(pack_01str(longest_runs_seq))
         print(result)
 
+        '''
+        Longest runs in a block test (batch of sequences)
+        '''
+        scores, q_values, passed = longest_runs_test.run_batch(numpy.array([pack_01str(longest_runs_seq)] * 2))
+        print(scores, q_values, passed)
+
         '''
         cumulative sums test
         '''
@@ -108,6 +224,12 @@ if __name__ == "__main__":
         result, time = sums_test.run(pack_01str(sums_seq))
         print(result)
 
+        '''
+        cumulative sums test (batch of sequences)
+        '''
+        scores, q_values, passed = sums_test.run_batch(numpy.array([pack_01str(sums_seq)] * 2))
+        print(scores, q_values, passed)
+
         '''
         approximate entropy test
         '''
@@ -115,6 +237,12 @@ if __name__ == "__main__":
         result, time = entropy_test.run(pack_01str(entropy_seq))
         print(result)
 
+        '''
+        approximate entropy test (batch of sequences)
+        '''
+        scores, q_values, passed = entropy_test.run_batch(numpy.array([pack_01str(entropy_seq)] * 2))
+        print(scores, q_values, passed)
+
         '''
         discrete fourier transform test
         '''
@@ -122,6 +250,12 @@ if __name__ == "__main__":
         result, time = fourier_test.run(pack_01str(fourier_seq))
         print(result)
 
+        '''
+        discrete fourier transform test (batch of sequences)
+        '''
+        scores, q_values, passed = fourier_test.run_batch(numpy.array([pack_01str(fourier_seq)] * 2))
+        print(scores, q_values, passed)
+
         e: str = ""
         with open("data/data.e", "rt") as f:
                 e = f.read()
@@ -134,6 +268,12 @@ if __name__ == "__main__":
         result, time = universal_test.run(pack_01str(e))
         print(result)
 
+        '''
+        Maurer's universal test (batch of sequences)
+        '''
+        scores, q_values, passed = universal_test.run_batch(numpy.array([pack_01str(e)] * 2))
+        print(scores, q_values, passed)
+
         '''
         Linear Complexity test
         '''
@@ -141,6 +281,12 @@ if __name__ == "__main__":
         result, time = complexity_test.run(pack_01str(e))
         print(result)
 
+        '''
+        Linear Complexity test (batch of sequences)
+        '''
+        scores, q_values, passed = complexity_test.run_batch(numpy.array([pack_01str(e)] * 2))
+        print(scores, q_values, passed)
+
         '''
         Binary matrix rank test
         '''
@@ -148,7 +294,160 @@ if __name__ == "__main__":
         result, time = matrix_test.run(pack_01str(e))
         print(result)
 
+        '''
+        Binary matrix rank test (batch of sequences)
+        '''
+        scores, q_values, passed = matrix_test.run_batch(numpy.array([pack_01str(e)] * 2))
+        print(scores, q_values, passed)
+
+        '''
+        Bit-packed batches of Berlekamp Massey and of binary ranks against the loops they replaced, on random blocks of a few densities
+        '''
+        kernels_rng: numpy.random.Generator = numpy.random.default_rng(5)
+        complexity_blocks: numpy.ndarray = (kernels_rng.random((300, 200)) < numpy.repeat([0.5, 0.1, 0.02], 100)[:, numpy.newaxis]).astype(numpy.uint8)
+        print(numpy.array_equal(LinearComplexityTest.berlekamp_massey_batch(complexity_blocks), [baseline_berlekamp_massey(block) for block in complexity_blocks]))
+        for rows_number, columns_number in ((32, 32), (6, 6), (5, 9)):
+            rank_blocks: numpy.ndarray = (kernels_rng.random((300, rows_number, columns_number)) < numpy.repeat([0.5, 0.2, 0.05], 100)[:, numpy.newaxis, numpy.newaxis]).astype(numpy.uint8)
+            baseline_ranks: list = [baseline_rank(block) for block in rank_blocks]
+            print(rows_number, columns_number, numpy.array_equal(BinaryMatrix.compute_ranks(rank_blocks), baseline_ranks), numpy.bincount(baseline_ranks))
+
+        '''
+        Sequences over 2^22 bits (10^8 battery): the kernels working a range at a time against the whole sequence at once
+        '''
+        long_bits: numpy.ndarray = numpy.random.default_rng(0).integers(0, 2, 5000000, dtype=numpy.uint8)
+        long_matrix: numpy.ndarray = long_bits.reshape((1, long_bits.size))
+        chunk_size: int = 1 << 18
+        print(CumulativeSumsTest._compute_max_excursions(long_matrix, chunk_size), CumulativeSumsTest._compute_max_excursions(long_matrix, long_bits.size))
+        print(numpy.array_equal(count_runs_by_length(long_matrix, 20, chunk_size), count_runs_by_length(long_matrix, 20, long_bits.size)))
+        long_runs_test: LongestRunsInABlockTest = LongestRunsInABlockTest(long_bits.size)
+        print(all(numpy.array_equal(chunked, whole) for chunked, whole in zip(long_runs_test._longest_runs(long_matrix, chunk_size), long_runs_test._longest_runs(long_matrix, long_bits.size))))
+        long_poker_test: PokerTest = PokerTest(long_bits.size, 4)
+        long_patterns: numpy.ndarray = long_bits.reshape((1, -1, 4)).dot(1 << numpy.arange(4))
+        print(long_poker_test._count_rows_patterns(long_patterns, chunk_size), numpy.bincount(long_patterns.ravel(), minlength=16))
+        long_universal_test: MaurersUniversalTest = MaurersUniversalTest(long_bits.size)
+        long_blocks: numpy.ndarray = long_bits[:long_bits.size // 7 * 7].reshape((-1, 7))
+        print(long_universal_test._sum_log_distances(long_blocks, 1280, chunk_size), long_universal_test._sum_log_distances(long_blocks, 1280, long_blocks.shape[0]))
+        # Four-step transform (2000 x 2500) in passes of 4 MiB of spectrum, against a single rfft
+        long_fourier_test: DiscreteFourierTransformTest = DiscreteFourierTransformTest(long_bits.size, memory_budget=1 << 22)
+        print(long_fourier_test._count_peaks_four_step(long_bits), long_fourier_test._count_peaks(long_matrix * 2.0 - 1.0)[0])
+        result, time = long_fourier_test.run(long_bits)
+        print(result)
+
+        '''
+        Sliding window monitor: the tests evaluated on the statistics of the window against Test.run on its bits
+        '''
+        window_size: int = 4096
+        stream_bytes: numpy.ndarray = numpy.random.default_rng(1).integers(0, 256, 2 * window_size // 8, dtype=numpy.uint8)
+        for monitor_chunk_size in (1, 3, window_size // 8 + 5):
+            monitor: SlidingWindowMonitor = SlidingWindowMonitor(window_size)
+            comparisons: int = 0
+            mismatched_passes: int = 0
+            worst_difference: float = 0.0
+            for start in range(0, stream_bytes.size, monitor_chunk_size):
+                monitor_results: dict = monitor.update(stream_bytes[start:start + monitor_chunk_size])
+                if monitor_results is None:
+                    continue
+                window_bits: numpy.ndarray = numpy.unpackbits(stream_bytes[:start + monitor_chunk_size])[-window_size:]
+                for name, test_unit in monitor.battery.items():
+                    result, time = test_unit.run(window_bits)
+                    comparisons += 1
+                    mismatched_passes += int(result.passed != monitor_results[name].passed)
+                    worst_difference = max(worst_difference, float(numpy.max(numpy.abs(result.score - monitor_results[name].score))), float(numpy.max(numpy.abs(result.q_value - monitor_results[name].q_value))))
+            print(monitor_chunk_size, comparisons, mismatched_passes, worst_difference)
+
+        '''
+        Result table: filled past the samples it was allocated for, and without keeping the samples
+        '''
+        table_rng: numpy.random.Generator = numpy.random.default_rng(6)
+        table_scores: numpy.ndarray = table_rng.random((7, 2))
+        table_passed: numpy.ndarray = table_scores[:, 0] >= 0.3
+        for keep_samples in (True, False):
+            table: ResultTable = ResultTable(["one value", "two values"], 2, keep_samples=keep_samples)
+            table.fill(0, 0, (table_scores[:3, :1], table_scores[:3, :1], table_passed[:3]))
+            table.fill(0, 3, (table_scores[3:, :1], table_scores[3:, :1], table_passed[3:]))
+            table.fill(1, 0, (table_scores, table_scores, numpy.ones(7, dtype=bool)))
+            print(len(table), table.scores.shape, table.passes(), [table.values_number(index) for index in range(2)], [column.size for column in table.q_value_columns(1)])
+            if keep_samples:
+                print(numpy.array_equal(table.q_value_columns(0)[0], table_scores[:, 0]), numpy.array_equal(table.passed[:, 0], table_passed), numpy.isnan(table.q_values[:, 0, 1]).all())
+            print(table.q_value_scores(), [QValueCollector.compute_value(table_scores[:, 0], 10), QValueCollector.compute_value(table_scores[:, 1], 10)])
+
+        '''
+        Battery on a file with one and with two worker processes: the same results in the same order
+        '''
+        battery_test: GmtRandomnessTest = GmtRandomnessTest(20000)
+        battery_directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        random_file: str = os.path.join(battery_directory.name, "random_20000")
+        numpy.random.default_rng(2).integers(0, 256, (24, 20000 // 8), dtype=numpy.uint8).tofile(random_file)
+        single_table: ResultTable = battery_test.run_all_battery_with_file(random_file, workers=1)
+        pool_table: ResultTable = battery_test.run_all_battery_with_file(random_file, workers=2)
+        print(len(single_table), len(pool_table), numpy.array_equal(single_table.scores, pool_table.scores, equal_nan=True), numpy.array_equal(single_table.q_values, pool_table.q_values, equal_nan=True), numpy.array_equal(single_table.passed, pool_table.passed))
+
+        '''
+        Samples of a file mapped in memory: a trailing partial sample is reported and left out, the workers map their own chunks of the file
+        '''
+        partial_file: str = os.path.join(battery_directory.name, "partial_20000")
+        partial_bytes: numpy.ndarray = numpy.random.default_rng(4).integers(0, 256, 10 * (20000 // 8) + 1000, dtype=numpy.uint8)
+        partial_bytes.tofile(partial_file)
+        mapped_sequences: numpy.ndarray = battery_test._read_sequences_from_file(partial_file)
+        print(type(mapped_sequences).__name__, mapped_sequences.shape, numpy.array_equal(mapped_sequences, partial_bytes[:10 * (20000 // 8)].reshape((10, -1))))
+        single_table = battery_test.run_all_battery_with_file(partial_file, workers=1)
+        pool_table = battery_test.run_all_battery_with_file(partial_file, workers=2)
+        print(len(single_table), len(pool_table), numpy.array_equal(single_table.scores, pool_table.scores, equal_nan=True), numpy.array_equal(single_table.q_values, pool_table.q_values, equal_nan=True), numpy.array_equal(single_table.passed, pool_table.passed))
+
+        '''
+        Samples read from a stream in chunks of 7 bytes (an iterator of bytes) against the same samples in the file
+        '''
+        stream_chunks = (partial_bytes[start:start + 7].tobytes() for start in range(0, partial_bytes.size, 7))
+        stream_table: ResultTable = battery_test.run_all_battery_with_stream(stream_chunks)
+        print(len(stream_table), stream_table.scores.shape, numpy.array_equal(stream_table.passes(), single_table.passes()), all(numpy.array_equal(stream_scores, file_scores) for stream_scores, file_scores in zip(stream_table.q_value_scores(), single_table.q_value_scores())))
+
+        '''
+        Screening: a generator giving 52% of ones is stopped by Monobit on the 7th sample (6 failures allowed in 200), the random samples are not stopped
+        '''
+        biased_file: str = os.path.join(battery_directory.name, "biased_20000")
+        numpy.packbits(numpy.random.default_rng(3).random((200, 20000)) < 0.52, axis=1).tofile(biased_file)
+        screening_report: ScreeningReport = battery_test.screen_all_battery_with_file(biased_file)
+        tripped_index: int = screening_report.table.test_names.index(screening_report.tripped_test)
+        print(screening_report.passed, screening_report.tripped_test, screening_report.tested[tripped_index], screening_report.failures[tripped_index], screening_report.allowed_failures[tripped_index])
+        screening_report = battery_test.screen_all_battery_with_file('data/data_20000')
+        print(screening_report.passed, screening_report.tripped_test, screening_report.skipped_runs, numpy.array_equal(screening_report.tested, numpy.full(len(screening_report.table.test_names), 1000)))
+
+        '''
+        Profiling: the count and percentiles of the invocations, a stream invoking every test once per sample
+        '''
+        profiler: Profiler = Profiler()
+        for duration in range(1, 101):
+            profiler.record("Monobit", duration)
+        aggregate: dict = profiler.aggregates()["Monobit"]
+        print(aggregate["count"], aggregate["samples"], aggregate["p50_ns"], aggregate["p95_ns"], aggregate["p99_ns"])
+        profiled_test: GmtRandomnessTest = GmtRandomnessTest(20000)
+        profiled_test.enable_profiling()
+        with open(random_file, "rb") as random_stream:
+            profiled_test.run_battery_by_names_with_stream(random_stream, ["monobit", "poker_8"])
+        for name, aggregate in profiled_test.profile_aggregates().items():
+            print(name, aggregate["count"], aggregate["samples"], 0 < aggregate["p50_ns"] <= aggregate["p95_ns"] <= aggregate["p99_ns"])
+        # Test.run returns the duration the profiler records, in milliseconds
+        profiler = Profiler()
+        result, time = MonobitTest(128).run(pack_01str(monobit_test_seq), profiler)
+        print(type(time).__name__, round(time * 1e6) == profiler.aggregates()["Monobit"]["total_ns"])
+        battery_directory.cleanup()
+
         '''
         q values test
         '''
         print(QValueCollector.compute_value(numpy.array(q_values_list), 10))
+
+        '''
+        q values in the fixed sub-intervals [0, 0.1), ..., [0.9, 1]: 0.0 in the first, 1.0 in the last, NaN not counted
+        '''
+        edge_q_values: numpy.ndarray = numpy.array([0.0, 0.0, 0.05, 0.1, 0.3, 0.45, 0.5, 0.5, 0.75, 0.9, 0.95, 1.0, 1.0, numpy.nan])
+        print(interval_counts(edge_q_values, 10), numpy.array([3, 1, 0, 1, 1, 2, 0, 1, 0, 4]))
+
+        '''
+        q values counted as the samples arrive (one pair per list, the second list in two batches)
+        '''
+        accumulator: QValueAccumulator = QValueAccumulator(2, 10)
+        accumulator.add(0, edge_q_values[:, numpy.newaxis])
+        accumulator.add(1, numpy.array(q_values_list[:20])[:, numpy.newaxis])
+        accumulator.add(1, numpy.array(q_values_list[20:])[:, numpy.newaxis])
+        print(accumulator.scores(), [QValueCollector.compute_value(edge_q_values, 10), QValueCollector.compute_value(numpy.array(q_values_list), 10)])